@@ -6,10 +6,10 @@ https://anilist.co
 """
 
 import requests
-import time
 import logging
 from typing import Optional, Dict, Any, List
-from metadata_bangumi import MangaMetadata
+from metadata_bangumi import MangaMetadata, MetadataRequestError
+from rate_limiter import RateLimiter
 
 logger = logging.getLogger(__name__)
 
@@ -28,7 +28,7 @@ class AniListAPI:
             rate_limit_delay: 请求间隔（秒）
         """
         self.rate_limit_delay = rate_limit_delay
-        self.last_request_time = 0
+        self.rate_limiter = RateLimiter(interval=rate_limit_delay)
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': self.USER_AGENT,
@@ -37,19 +37,18 @@ class AniListAPI:
         })
 
     def _rate_limit(self):
-        """速率限制"""
-        elapsed = time.time() - self.last_request_time
-        if elapsed < self.rate_limit_delay:
-            time.sleep(self.rate_limit_delay - elapsed)
-        self.last_request_time = time.time()
+        """速率限制（线程安全，根据响应自适应调整请求间隔）"""
+        self.rate_limiter.wait()
 
-    def _request(self, query: str, variables: Optional[Dict] = None) -> Optional[Dict]:
+    def _request(self, query: str, variables: Optional[Dict] = None,
+                 raise_errors: bool = False) -> Optional[Dict]:
         """
         发送GraphQL请求
 
         Args:
             query: GraphQL查询
             variables: 查询变量
+            raise_errors: 请求失败时抛出MetadataRequestError而不是返回None（404仍视为无结果）
 
         Returns:
             响应数据
@@ -62,6 +61,7 @@ class AniListAPI:
                 json={'query': query, 'variables': variables or {}},
                 timeout=10
             )
+            self.rate_limiter.on_response(response.status_code, response.headers)
             response.raise_for_status()
             data = response.json()
 
@@ -71,15 +71,22 @@ class AniListAPI:
 
             return data.get('data')
         except requests.exceptions.RequestException as e:
+            # 搜索无匹配时AniList返回404
+            response = getattr(e, 'response', None)
+            if response is not None and response.status_code == 404:
+                return None
             logger.warning(f"AniList API请求失败: {e}")
+            if raise_errors:
+                raise MetadataRequestError(str(e)) from e
             return None
 
-    def search_manga(self, title: str) -> Optional[MangaMetadata]:
+    def search_manga(self, title: str, raise_errors: bool = False) -> Optional[MangaMetadata]:
         """
         搜索漫画
 
         Args:
             title: 漫画标题
+            raise_errors: 请求失败时抛出MetadataRequestError（调用方据此区分“无结果”和“请求失败”）
 
         Returns:
             元数据对象或None
@@ -129,7 +136,7 @@ class AniListAPI:
             'type': 'MANGA'
         }
 
-        data = self._request(query, variables)
+        data = self._request(query, variables, raise_errors)
 
         if not data or 'Media' not in data:
             logger.warning(f"AniList未找到结果: {title}")
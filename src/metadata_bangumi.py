@@ -6,14 +6,18 @@ https://bangumi.tv / https://api.bgm.tv
 """
 
 import requests
-import time
 import logging
 from typing import Optional, Dict, Any, List
 from dataclasses import dataclass
+from rate_limiter import RateLimiter
 
 logger = logging.getLogger(__name__)
 
 
+class MetadataRequestError(Exception):
+    """元数据API请求失败（超时、限流、服务器错误等），区别于API正常返回“无结果”"""
+
+
 @dataclass
 class MangaMetadata:
     """漫画元数据"""
@@ -47,7 +51,7 @@ class BangumiAPI:
             rate_limit_delay: 请求间隔（秒）
         """
         self.rate_limit_delay = rate_limit_delay
-        self.last_request_time = 0
+        self.rate_limiter = RateLimiter(interval=rate_limit_delay)
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': self.USER_AGENT,
@@ -55,19 +59,18 @@ class BangumiAPI:
         })
 
     def _rate_limit(self):
-        """速率限制"""
-        elapsed = time.time() - self.last_request_time
-        if elapsed < self.rate_limit_delay:
-            time.sleep(self.rate_limit_delay - elapsed)
-        self.last_request_time = time.time()
+        """速率限制（线程安全，根据响应自适应调整请求间隔）"""
+        self.rate_limiter.wait()
 
-    def _request(self, endpoint: str, params: Optional[Dict] = None) -> Optional[Dict]:
+    def _request(self, endpoint: str, params: Optional[Dict] = None,
+                 raise_errors: bool = False) -> Optional[Dict]:
         """
         发送API请求
 
         Args:
             endpoint: API端点
             params: 请求参数
+            raise_errors: 请求失败时抛出MetadataRequestError而不是返回None（404仍视为无结果）
 
         Returns:
             响应数据
@@ -77,19 +80,27 @@ class BangumiAPI:
         url = f"{self.BASE_URL}{endpoint}"
         try:
             response = self.session.get(url, params=params, timeout=10)
+            self.rate_limiter.on_response(response.status_code, response.headers)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
+            response = getattr(e, 'response', None)
+            if response is not None and response.status_code == 404:
+                return None
             logger.warning(f"Bangumi API请求失败: {e}")
+            if raise_errors:
+                raise MetadataRequestError(str(e)) from e
             return None
 
-    def search(self, query: str, subject_type: int = 1) -> Optional[List[Dict[str, Any]]]:
+    def search(self, query: str, subject_type: int = 1,
+               raise_errors: bool = False) -> Optional[List[Dict[str, Any]]]:
         """
         搜索条目
 
         Args:
             query: 搜索关键词
             subject_type: 条目类型 (1=书籍/漫画, 2=动画, 3=音乐, 4=游戏, 6=真人)
+            raise_errors: 请求失败时抛出MetadataRequestError
 
         Returns:
             搜索结果列表
@@ -100,24 +111,25 @@ class BangumiAPI:
         }
 
         # Bangumi v0 API 搜索
-        result = self._request(f"/search/subject/{query}", params)
+        result = self._request(f"/search/subject/{query}", params, raise_errors)
 
         if result and 'list' in result:
             return result['list']
 
         return None
 
-    def get_subject(self, subject_id: int) -> Optional[Dict[str, Any]]:
+    def get_subject(self, subject_id: int, raise_errors: bool = False) -> Optional[Dict[str, Any]]:
         """
         获取条目详情
 
         Args:
             subject_id: 条目ID
+            raise_errors: 请求失败时抛出MetadataRequestError
 
         Returns:
             条目详情
         """
-        return self._request(f"/v0/subjects/{subject_id}")
+        return self._request(f"/v0/subjects/{subject_id}", raise_errors=raise_errors)
 
     def parse_metadata(self, subject_data: Dict[str, Any]) -> MangaMetadata:
         """
@@ -203,13 +215,15 @@ class BangumiAPI:
             source_id=str(subject_data.get('id'))
         )
 
-    def search_manga(self, title: str, author: Optional[str] = None) -> Optional[MangaMetadata]:
+    def search_manga(self, title: str, author: Optional[str] = None,
+                     raise_errors: bool = False) -> Optional[MangaMetadata]:
         """
         搜索漫画并返回最佳匹配
 
         Args:
             title: 漫画标题
             author: 作者名（可选，用于验证）
+            raise_errors: 请求失败时抛出MetadataRequestError（调用方据此区分“无结果”和“请求失败”）
 
         Returns:
             元数据对象或None
@@ -217,7 +231,7 @@ class BangumiAPI:
         logger.info(f"Bangumi搜索: {title}")
 
         # 搜索
-        results = self.search(title, subject_type=1)
+        results = self.search(title, subject_type=1, raise_errors=raise_errors)
 
         if not results:
             logger.warning(f"Bangumi未找到结果: {title}")
@@ -231,7 +245,7 @@ class BangumiAPI:
             return None
 
         # 获取详细信息
-        subject_data = self.get_subject(subject_id)
+        subject_data = self.get_subject(subject_id, raise_errors=raise_errors)
 
         if not subject_data:
             return None
@@ -13,6 +13,14 @@ from .base import MetadataSource, MangaMetadata
 
 logger = logging.getLogger(__name__)
 
+# AniList状态 -> 中文状态
+_STATUS_MAP = {
+    'FINISHED': '已完结',
+    'RELEASING': '连载中',
+    'NOT_YET_RELEASED': '未发布',
+    'CANCELLED': '已取消'
+}
+
 
 class TraceMoeSource(MetadataSource):
     """trace.moe AniList代理（中文翻译）"""
@@ -239,13 +247,7 @@ class TraceMoeSource(MetadataSource):
 
         # 状态
         status = media.get('status')
-        status_map = {
-            'FINISHED': '已完结',
-            'RELEASING': '连载中',
-            'NOT_YET_RELEASED': '未发布',
-            'CANCELLED': '已取消'
-        }
-        metadata.status = status_map.get(status, status)
+        metadata.status = _STATUS_MAP.get(status, status) if status else None
 
         # 封面
         cover = media.get('coverImage', {})
@@ -254,7 +256,7 @@ class TraceMoeSource(MetadataSource):
         # 元信息
         metadata.source = 'trace.moe/AniList'
         metadata.source_id = str(media.get('id'))
-        metadata.language = 'zh' if metadata.title_zh else 'ja'
+        metadata.language = 'zh' if titles.get('chinese') else 'ja'
 
         return metadata
 
@@ -20,8 +20,14 @@ from typing import Dict, List, Tuple, Optional, Set, Any
 from dataclasses import dataclass, asdict
 from datetime import datetime, timedelta
 import logging
+import logging.handlers
 import tempfile
 
+try:
+    from tqdm import tqdm
+except ImportError:
+    tqdm = None
+
 # 导入进度跟踪器
 from progress_tracker import ProgressTracker
 
@@ -68,17 +74,24 @@ if sys.platform == 'win32':
 # 配置UnRAR工具路径
 rarfile.UNRAR_TOOL = r"C:\Program Files\UnRAR\UnRAR.exe"
 
-# 配置日志
+# 配置日志（文件日志经MemoryHandler批量写入，ERROR及以上立即落盘）
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+_file_handler = logging.FileHandler('nested_rar_processor.log', encoding='utf-8')
+_file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
+    format=LOG_FORMAT,
     handlers=[
-        logging.FileHandler('nested_rar_processor.log', encoding='utf-8'),
+        logging.handlers.MemoryHandler(capacity=100, target=_file_handler),
         logging.StreamHandler()
     ]
 )
 logger = logging.getLogger(__name__)
 
+# 扩展名元组（小写），用于对文件名做str.endswith判断，避免逐项构造Path
+_RAR_EXT_TUPLE = ('.rar', '.cbr')
+_IMG_EXT_TUPLE = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp')
+
 
 @dataclass
 class ProcessResult:
@@ -124,9 +137,15 @@ class NestedRARProcessor:
     # RAR扩展名
     RAR_EXTENSIONS = {'.rar', '.cbr'}
 
+    # CBZ压缩方式
+    CBZ_COMPRESSIONS = ('store', 'deflate', 'zstd')
+
+    # 网络文件系统类型（输出到这些文件系统时默认压缩以减少写入量）
+    NETWORK_FS_TYPES = {'nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', 'fuse.sshfs'}
+
     def __init__(self, output_dir: str, temp_dir: Optional[str] = None, dry_run: bool = False,
                  enable_progress_tracking: bool = True, progress_file: Optional[str] = None,
-                 auto_save_interval: int = 10):
+                 auto_save_interval: int = 10, cbz_compression: Optional[str] = None):
         """
         初始化处理器
 
@@ -136,14 +155,20 @@ class NestedRARProcessor:
             dry_run: 预演模式（不实际处理）
             enable_progress_tracking: 启用进度跟踪
             progress_file: 进度文件路径
-            auto_save_interval: 自动保存间隔（文件数）
+            auto_save_interval: 已不再使用（进度由ProgressTracker按条数/时间合并保存），保留以兼容旧调用
+            cbz_compression: CBZ压缩方式（store/deflate/zstd，None则根据输出目录自动选择）
         """
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
 
+        self.cbz_compression = cbz_compression or self._detect_cbz_compression(self.output_dir)
+        if self.cbz_compression == 'zstd' and not hasattr(zipfile, 'ZIP_ZSTANDARD'):
+            logger.warning("当前Python不支持Zstandard压缩（需要3.14+），改用deflate")
+            self.cbz_compression = 'deflate'
+        logger.info(f"CBZ压缩方式: {self.cbz_compression}")
+
         self.temp_dir = Path(temp_dir) if temp_dir else None
         self.dry_run = dry_run
-        self.auto_save_interval = auto_save_interval
 
         # 初始化进度跟踪器
         self.enable_progress_tracking = enable_progress_tracking
@@ -165,12 +190,13 @@ class NestedRARProcessor:
         self.results: List[ProcessResult] = []
         self.session_start_time = None
 
-    def process_rar_file(self, rar_path: Path) -> ProcessResult:
+    def process_rar_file(self, rar_path: Path, file_size: Optional[int] = None) -> ProcessResult:
         """
         处理单个RAR文件
 
         Args:
             rar_path: RAR文件路径
+            file_size: 文件大小（扫描目录时已获取则传入，避免重复stat）
 
         Returns:
             ProcessResult对象
@@ -194,52 +220,37 @@ class NestedRARProcessor:
             )
 
         try:
-            # 创建临时目录
-            if self.temp_dir:
-                temp_root = self.temp_dir / f"temp_{rar_path.stem}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-                temp_root.mkdir(parents=True, exist_ok=True)
+            # 很多.cbr实际上是ZIP，直接复制为CBZ，无需调用UnRAR解压再打包
+            if self._is_zip_archive(rar_path):
+                logger.info("检测到ZIP格式，直接复制为CBZ")
+                output_files = self._copy_zip_as_cbz(rar_path)
             else:
-                temp_root = Path(tempfile.mkdtemp(prefix=f"rar_process_{rar_path.stem}_"))
+                output_files = self._extract_and_convert(rar_path)
 
-            try:
-                # 检查是否是嵌套RAR
-                is_nested, inner_rars = self._check_nested_rar(rar_path)
+            # 更新统计
+            self.stats['total_processed'] += 1
+            self.stats['successful'] += 1
+            self.stats['cbz_created'] += len(output_files)
+            if file_size is None:
+                file_size = rar_path.stat().st_size
+            self.stats['total_size_processed'] += file_size
 
-                if is_nested:
-                    logger.info(f"检测到嵌套RAR，包含 {len(inner_rars)} 个内层RAR")
-                    output_files = self._process_nested_rar(rar_path, temp_root)
-                else:
-                    logger.info("非嵌套RAR，直接转换")
-                    output_files = self._process_single_rar(rar_path, temp_root)
-
-                # 更新统计
-                self.stats['total_processed'] += 1
-                self.stats['successful'] += 1
-                self.stats['cbz_created'] += len(output_files)
-                self.stats['total_size_processed'] += rar_path.stat().st_size
-
-                processing_time = (datetime.now() - start_time).total_seconds()
-
-                result = ProcessResult(
-                    original_path=file_path_str,
-                    output_files=output_files,
-                    success=True,
-                    files_created=len(output_files),
-                    processing_time=processing_time
-                )
-
-                # 标记处理完成
-                if self.progress_tracker:
-                    self.progress_tracker.mark_completed(file_path_str, output_files)
-
-                logger.info(f"处理完成: 创建 {len(output_files)} 个CBZ文件，耗时 {processing_time:.2f}秒")
-                return result
-
-            finally:
-                # 清理临时目录
-                if temp_root.exists():
-                    shutil.rmtree(temp_root, ignore_errors=True)
-                    logger.debug(f"清理临时目录: {temp_root}")
+            processing_time = (datetime.now() - start_time).total_seconds()
+
+            result = ProcessResult(
+                original_path=file_path_str,
+                output_files=output_files,
+                success=True,
+                files_created=len(output_files),
+                processing_time=processing_time
+            )
+
+            # 标记处理完成
+            if self.progress_tracker:
+                self.progress_tracker.mark_completed(file_path_str, output_files)
+
+            logger.info(f"处理完成: 创建 {len(output_files)} 个CBZ文件，耗时 {processing_time:.2f}秒")
+            return result
 
         except Exception as e:
             error_msg = f"处理失败: {e}"
@@ -259,6 +270,72 @@ class NestedRARProcessor:
                 processing_time=(datetime.now() - start_time).total_seconds()
             )
 
+    @staticmethod
+    def _is_zip_archive(archive_path: Path) -> bool:
+        """
+        通过文件头判断是否为ZIP格式（扩展名为.cbr但实际是ZIP的情况）
+
+        Args:
+            archive_path: 压缩文件路径
+
+        Returns:
+            是否为ZIP
+        """
+        with open(archive_path, 'rb') as f:
+            return f.read(4) == b'PK\x03\x04'
+
+    def _copy_zip_as_cbz(self, zip_path: Path) -> List[str]:
+        """
+        将ZIP格式的压缩包直接复制为CBZ
+
+        Args:
+            zip_path: 压缩文件路径
+
+        Returns:
+            生成的CBZ文件列表
+        """
+        cbz_name = self._clean_and_generate_cbz_name(zip_path.name, zip_path.name)
+        cbz_path = self.output_dir / cbz_name
+
+        shutil.copyfile(zip_path, cbz_path)
+
+        logger.info(f"创建CBZ: {cbz_name}")
+        return [str(cbz_path)]
+
+    def _extract_and_convert(self, rar_path: Path) -> List[str]:
+        """
+        解压RAR并转换为CBZ（自动识别嵌套RAR）
+
+        Args:
+            rar_path: RAR文件路径
+
+        Returns:
+            生成的CBZ文件列表
+        """
+        # 创建临时目录
+        if self.temp_dir:
+            temp_root = self.temp_dir / f"temp_{rar_path.stem}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            temp_root.mkdir(parents=True, exist_ok=True)
+        else:
+            temp_root = Path(tempfile.mkdtemp(prefix=f"rar_process_{rar_path.stem}_"))
+
+        try:
+            # 检查是否是嵌套RAR
+            is_nested, inner_rars = self._check_nested_rar(rar_path)
+
+            if is_nested:
+                logger.info(f"检测到嵌套RAR，包含 {len(inner_rars)} 个内层RAR")
+                return self._process_nested_rar(rar_path, temp_root)
+            else:
+                logger.info("非嵌套RAR，直接转换")
+                return self._process_single_rar(rar_path, temp_root)
+
+        finally:
+            # 清理临时目录
+            if temp_root.exists():
+                shutil.rmtree(temp_root, ignore_errors=True)
+                logger.debug(f"清理临时目录: {temp_root}")
+
     def _check_nested_rar(self, rar_path: Path) -> Tuple[bool, List[str]]:
         """
         检查是否是嵌套RAR
@@ -274,10 +351,8 @@ class NestedRARProcessor:
         try:
             with rarfile.RarFile(str(rar_path)) as rf:
                 for member in rf.infolist():
-                    if not member.is_dir():
-                        ext = Path(member.filename).suffix.lower()
-                        if ext in self.RAR_EXTENSIONS:
-                            inner_rars.append(member.filename)
+                    if not member.is_dir() and member.filename.lower().endswith(_RAR_EXT_TUPLE):
+                        inner_rars.append(member.filename)
         except Exception as e:
             logger.error(f"检查嵌套RAR失败 {rar_path}: {e}")
             return False, []
@@ -306,10 +381,12 @@ class NestedRARProcessor:
             rf.extractall(str(outer_extract_dir))
 
         # 第二步：找到所有内层RAR文件
-        inner_rars = []
-        for item in outer_extract_dir.rglob('*'):
-            if item.is_file() and item.suffix.lower() in self.RAR_EXTENSIONS:
-                inner_rars.append(item)
+        inner_rars = [
+            Path(root, name)
+            for root, _, names in os.walk(outer_extract_dir)
+            for name in names
+            if name.lower().endswith(_RAR_EXT_TUPLE)
+        ]
 
         logger.info(f"找到 {len(inner_rars)} 个内层RAR文件")
 
@@ -439,11 +516,13 @@ class NestedRARProcessor:
             source_dir: 源目录
             cbz_path: CBZ文件路径
         """
-        # 收集所有图片文件
-        image_files = []
-        for ext in self.IMAGE_EXTENSIONS:
-            image_files.extend(source_dir.rglob(f'*{ext}'))
-            image_files.extend(source_dir.rglob(f'*{ext.upper()}'))
+        # 收集所有图片文件（单次遍历，大小写不敏感）
+        image_files = [
+            Path(root, name)
+            for root, _, names in os.walk(source_dir)
+            for name in names
+            if name.lower().endswith(_IMG_EXT_TUPLE)
+        ]
 
         if not image_files:
             logger.warning(f"目录中没有找到图片文件: {source_dir}")
@@ -454,17 +533,39 @@ class NestedRARProcessor:
 
         logger.info(f"找到 {len(image_files)} 个图片文件，正在打包...")
 
-        # 创建CBZ（实际上是ZIP）
-        with zipfile.ZipFile(cbz_path, 'w', zipfile.ZIP_STORED) as zf:
-            for img_file in image_files:
-                # 使用相对路径作为压缩包内的路径
-                arcname = img_file.relative_to(source_dir)
-                zf.write(img_file, arcname)
+        # 存储模式优先使用libarchive（C层完成写入与CRC计算），未安装时回退到zipfile
+        libarchive = None
+        if self.cbz_compression == 'store':
+            try:
+                import libarchive
+            except ImportError:
+                pass
+
+        if libarchive:
+            with libarchive.file_writer(str(cbz_path), 'zip', options='compression=store') as archive:
+                for img_file in image_files:
+                    arcname = img_file.relative_to(source_dir).as_posix()
+                    data = img_file.read_bytes()
+                    archive.add_file_from_memory(arcname, len(data), data)
+        else:
+            if self.cbz_compression == 'deflate':
+                compression, compresslevel = zipfile.ZIP_DEFLATED, 1
+            elif self.cbz_compression == 'zstd':
+                compression, compresslevel = zipfile.ZIP_ZSTANDARD, 3
+            else:
+                compression, compresslevel = zipfile.ZIP_STORED, None
+
+            # 创建CBZ（实际上是ZIP）
+            with zipfile.ZipFile(cbz_path, 'w', compression, compresslevel=compresslevel) as zf:
+                for img_file in image_files:
+                    # 使用相对路径作为压缩包内的路径
+                    arcname = img_file.relative_to(source_dir)
+                    zf.write(img_file, arcname)
 
         logger.debug(f"CBZ创建完成: {cbz_path}")
 
     def process_batch(self, rar_files: List[Path], max_files: Optional[int] = None,
-                      resume: bool = True) -> None:
+                      resume: bool = True, file_sizes: Optional[Dict[str, int]] = None) -> None:
         """
         批量处理RAR文件（支持断点续传）
 
@@ -472,7 +573,9 @@ class NestedRARProcessor:
             rar_files: RAR文件列表
             max_files: 最大处理文件数（用于测试）
             resume: 是否从上次中断处继续
+            file_sizes: 文件路径 -> 文件大小（可选，扫描目录时获取）
         """
+        file_sizes = file_sizes or {}
         self.session_start_time = datetime.now()
 
         # 准备文件列表
@@ -512,18 +615,20 @@ class NestedRARProcessor:
         logger.info(f"开始批量处理 {total} 个文件...")
 
         try:
-            for idx, rar_path in enumerate(rar_files, 1):
-                logger.info(f"\n{'='*80}")
-                logger.info(f"进度: [{idx}/{total}] {rar_path.name}")
-                logger.info(f"{'='*80}")
+            # 安装了tqdm时用进度条显示进度，逐文件横幅降为DEBUG
+            progress_iter = tqdm(rar_files, desc="Processing", unit="file") if tqdm else rar_files
+            for idx, rar_path in enumerate(progress_iter, 1):
+                logger.debug(f"\n{'='*80}")
+                if tqdm:
+                    logger.debug(f"进度: [{idx}/{total}] {rar_path.name}")
+                else:
+                    logger.info(f"进度: [{idx}/{total}] {rar_path.name}")
+                logger.debug(f"{'='*80}")
 
-                result = self.process_rar_file(rar_path)
+                result = self.process_rar_file(rar_path, file_sizes.get(str(rar_path)))
                 self.results.append(result)
 
-                # 自动保存进度
-                if self.progress_tracker and idx % self.auto_save_interval == 0:
-                    self.progress_tracker.save()
-                    logger.debug(f"自动保存进度 ({idx}/{total})")
+                # 进度由ProgressTracker在mark_completed/mark_failed时自动合并保存
 
                 # 每10个文件输出一次统计
                 if idx % 10 == 0:
@@ -534,7 +639,6 @@ class NestedRARProcessor:
             # 结束会话
             if self.progress_tracker:
                 self.progress_tracker.end_session("completed")
-                self.progress_tracker.save()
 
             self._print_final_report()
 
@@ -544,7 +648,6 @@ class NestedRARProcessor:
             # 保存进度
             if self.progress_tracker:
                 self.progress_tracker.end_session("interrupted")
-                self.progress_tracker.save()
                 logger.info("进度已保存，可以稍后使用 --resume 继续")
 
             self._print_final_report()
@@ -556,11 +659,50 @@ class NestedRARProcessor:
             # 保存进度
             if self.progress_tracker:
                 self.progress_tracker.end_session("error")
-                self.progress_tracker.save()
 
             self._print_final_report()
             raise
 
+    @classmethod
+    def _detect_cbz_compression(cls, output_dir: Path) -> str:
+        """
+        根据输出目录所在文件系统选择默认压缩方式
+
+        网络盘通常受限于写入带宽，使用deflate减少写入量；本地盘使用store
+
+        Args:
+            output_dir: 输出目录
+
+        Returns:
+            压缩方式
+        """
+        try:
+            if sys.platform == 'win32':
+                import ctypes
+                drive = os.path.splitdrive(str(output_dir.resolve()))[0] + '\\'
+                DRIVE_REMOTE = 4
+                if ctypes.windll.kernel32.GetDriveTypeW(drive) == DRIVE_REMOTE:
+                    return 'deflate'
+            elif sys.platform.startswith('linux'):
+                # 查找输出目录所在的挂载点（最长前缀匹配）
+                target = str(output_dir.resolve())
+                best_mount, best_type = '', ''
+                with open('/proc/mounts', 'r', encoding='utf-8') as f:
+                    for line in f:
+                        parts = line.split()
+                        if len(parts) < 3:
+                            continue
+                        mount_point, fs_type = parts[1], parts[2]
+                        if (target == mount_point or target.startswith(mount_point.rstrip('/') + '/')) \
+                                and len(mount_point) > len(best_mount):
+                            best_mount, best_type = mount_point, fs_type
+                if best_type in cls.NETWORK_FS_TYPES:
+                    return 'deflate'
+        except Exception as e:
+            logger.debug(f"检测输出文件系统失败: {e}")
+
+        return 'store'
+
     def _print_progress(self) -> None:
         """打印进度统计"""
         logger.info(f"\n当前进度统计:")
@@ -648,6 +790,8 @@ def main():
     parser.add_argument('--no-progress', action='store_true', help='禁用进度跟踪')
     parser.add_argument('--progress-file', help='进度文件路径（默认：.progress/processing_progress.json）')
     parser.add_argument('--use-config', action='store_true', help='使用config.json中的路径配置')
+    parser.add_argument('--cbz-compression', choices=NestedRARProcessor.CBZ_COMPRESSIONS,
+                        help='CBZ压缩方式（默认：本地盘store，网络盘deflate）')
 
     args = parser.parse_args()
 
@@ -681,18 +825,24 @@ def main():
         temp_dir=args.temp,
         dry_run=args.dry_run,
         enable_progress_tracking=not args.no_progress,
-        progress_file=args.progress_file
+        progress_file=args.progress_file,
+        cbz_compression=args.cbz_compression
     )
 
     # 收集RAR文件
     input_path = Path(input_dir)
+    file_sizes = {}
     if input_path.is_file():
         rar_files = [input_path]
     elif input_path.is_dir():
-        rar_files = []
-        for ext in NestedRARProcessor.RAR_EXTENSIONS:
-            rar_files.extend(input_path.glob(f'*{ext}'))
-        rar_files.sort()
+        # 单次scandir遍历，顺便缓存文件大小（DirEntry自带stat结果）
+        rar_exts = NestedRARProcessor.RAR_EXTENSIONS
+        with os.scandir(input_path) as it:
+            entries = [(e.name, e.path, e.stat().st_size) for e in it
+                       if e.is_file() and os.path.splitext(e.name)[1].lower() in rar_exts]
+        entries.sort()
+        rar_files = [Path(p) for _, p, _ in entries]
+        file_sizes = {str(path): size for path, (_, _, size) in zip(rar_files, entries)}
     else:
         logger.error(f"无效的输入路径: {input_path}")
         return
@@ -700,7 +850,8 @@ def main():
     logger.info(f"找到 {len(rar_files)} 个RAR文件")
 
     # 批量处理
-    processor.process_batch(rar_files, max_files=args.max_files, resume=args.resume)
+    processor.process_batch(rar_files, max_files=args.max_files, resume=args.resume,
+                            file_sizes=file_sizes)
 
     # 保存报告
     if args.report:
@@ -20,54 +20,25 @@ import zipfile
 import json
 import argparse
 import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional, Set, Any
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 from dataclasses import dataclass, asdict
 from datetime import datetime
 import logging
 import tempfile
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # 导入元数据模块
 from simple_tracker import SimpleTracker
 from metadata_bangumi import BangumiAPI, MangaMetadata
 from metadata_anilist import AniListAPI
 from comicinfo_generator import ComicInfoGenerator
 
-# Windows UTF-8 编码设置
-if sys.platform == 'win32':
-    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
-    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
-
-    # 修复Windows下sys.argv的Unicode编码问题
-    try:
-        from ctypes import POINTER, byref, cdll, c_int, windll
-        from ctypes.wintypes import LPCWSTR, LPWSTR
-
-        GetCommandLineW = cdll.kernel32.GetCommandLineW
-        GetCommandLineW.argtypes = []
-        GetCommandLineW.restype = LPCWSTR
-
-        CommandLineToArgvW = windll.shell32.CommandLineToArgvW
-        CommandLineToArgvW.argtypes = [LPCWSTR, POINTER(c_int)]
-        CommandLineToArgvW.restype = POINTER(LPWSTR)
-
-        cmd = GetCommandLineW()
-        argc = c_int(0)
-        argv_unicode = CommandLineToArgvW(cmd, byref(argc))
-
-        argv_list = [argv_unicode[i] for i in range(argc.value)]
-
-        script_index = 0
-        for i, arg in enumerate(argv_list):
-            if arg.endswith('.py'):
-                script_index = i
-                break
-
-        if script_index > 0:
-            sys.argv = argv_list[script_index:]
-    except Exception as e:
-        print(f"Warning: Failed to get Unicode command line arguments: {e}", file=sys.stderr)
-
 # 配置UnRAR工具路径
 rarfile.UNRAR_TOOL = r"C:\Program Files\UnRAR\UnRAR.exe"
 
@@ -83,6 +54,103 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def _write_json(path: Path, data: Any):
+    """
+    写入格式化的JSON（安装了orjson时使用orjson），dataclass对象可直接传入
+
+    Args:
+        path: 文件路径
+        data: 要写入的数据
+    """
+    if orjson:
+        path.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2, default=asdict)
+
+
+def _read_json(path: Path) -> Any:
+    """
+    读取JSON（安装了orjson时使用orjson）
+
+    Args:
+        path: 文件路径
+
+    Returns:
+        解析后的数据
+    """
+    if orjson:
+        return orjson.loads(path.read_bytes())
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+_DIGITS_RE = re.compile(r'(\d+)')
+
+
+def _natural_sort_key(name: str) -> List[Any]:
+    """
+    自然排序键：数字部分按数值比较，其余部分不区分大小写
+
+    Args:
+        name: 文件名或相对路径
+
+    Returns:
+        排序键
+    """
+    return [int(token) if token.isdigit() else token.lower() for token in _DIGITS_RE.split(name)]
+
+
+def _iter_files_by_ext(root: Path, exts: Set[str]) -> Iterator[Path]:
+    """
+    单次遍历目录树，返回扩展名（不区分大小写）在exts中的文件
+
+    Args:
+        root: 根目录
+        exts: 扩展名集合（小写，不带点）
+
+    Yields:
+        匹配的文件路径
+    """
+    stack = [str(root)]
+    while stack:
+        current = stack.pop()
+        try:
+            it = os.scandir(current)
+        except OSError as e:
+            # 与Path.glob一致：跳过无权限的目录（如System Volume Information）
+            logger.warning(f"无法读取目录，已跳过: {current} ({e})")
+            continue
+        with it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                    continue
+                _, dot, ext = entry.name.rpartition('.')
+                if dot and ext.lower() in exts:
+                    yield Path(entry.path)
+
+
+def _iter_rars(input_path: Path, exts: Set[str]) -> Iterator[Path]:
+    """
+    单次扫描输入目录（不递归），返回扩展名匹配的RAR文件
+
+    Args:
+        input_path: 输入目录
+        exts: 扩展名集合（小写，不带点）
+
+    Yields:
+        RAR文件路径
+    """
+    with os.scandir(input_path) as it:
+        for entry in it:
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            _, dot, ext = entry.name.rpartition('.')
+            if dot and ext.lower() in exts:
+                yield Path(entry.path)
+
+
 @dataclass
 class ProcessResult:
     """单个文件处理结果"""
@@ -123,14 +191,57 @@ class NestedRARProcessorV2:
         (r'[_-](\d{2,3})[\._]', 'v{:02d}'),
     ]
 
+    # 预编译的正则（日文标记合并为一个分支表达式，一次扫描完成）
+    _JP_TAG_RE = re.compile('|'.join(JAPANESE_TAG_PATTERNS))
+    _QUAN_RE = re.compile(r'全\d+[巻卷]')
+    _QUOTE_RE = re.compile(r'[「」『』\[\]（）()]')
+    _WS_RE = re.compile(r'\s+')
+    _ILLEGAL_RE = re.compile(r'[<>:"/\\|?*]')
+    _VOL_RES = [(re.compile(pattern), fmt) for pattern, fmt in VOLUME_PATTERNS]
+
     # 支持的图片格式
     IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp'}
 
     # RAR扩展名
     RAR_EXTENSIONS = {'.rar', '.cbr'}
 
+    # 不带点的扩展名（目录遍历时直接与文件名后缀比较）
+    _IMG_EXT_NODOT = {ext[1:] for ext in IMAGE_EXTENSIONS}
+    _RAR_EXT_NODOT = {ext[1:] for ext in RAR_EXTENSIONS}
+
+    # CBZ压缩方式（图片本身已压缩，默认不再压缩）
+    COMPRESSION_TYPES = {
+        'stored': zipfile.ZIP_STORED,
+        'deflated': zipfile.ZIP_DEFLATED,
+    }
+
+    # 打包时的复制缓冲区大小
+    COPY_BUFFER_SIZE = 1 << 20
+
+    # CBZ内文件的固定时间戳（ZIP格式的最小值）
+    ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+    # CBZ成员统一使用的Unix权限（rw-r--r--）
+    ZIP_EXTERNAL_ATTR = 0o644 << 16
+
+    # 元数据缓存有效期（秒）
+    METADATA_CACHE_TTL = 7 * 86400
+
+    # 元数据预取并发数
+    PREFETCH_WORKERS = 4
+
+    # 内层RAR并行解压线程数（单进程处理时；多进程处理时每个进程只用1个线程，
+    # 同时进行的UnRAR解压总数不超过进程数）
+    INNER_RAR_WORKERS = 4
+
+    # 完成标记批量写入：累计条数或间隔（秒）达到阈值时写入跟踪文件
+    MARK_FLUSH_COUNT = 10
+    MARK_FLUSH_INTERVAL = 30.0
+
     def __init__(self, output_dir: str, temp_dir: Optional[str] = None,
-                 enable_metadata: bool = True, dry_run: bool = False):
+                 enable_metadata: bool = True, dry_run: bool = False,
+                 compression: str = 'stored',
+                 metadata_cache_file: str = ".progress/metadata_cache.json",
+                 inner_workers: Optional[int] = None):
         """
         初始化处理器
 
@@ -139,19 +250,31 @@ class NestedRARProcessorV2:
             temp_dir: 临时目录
             enable_metadata: 启用元数据获取
             dry_run: 预演模式
+            compression: CBZ压缩方式（stored/deflated）
+            metadata_cache_file: 元数据缓存文件路径
+            inner_workers: 内层RAR并行解压线程数（None则使用INNER_RAR_WORKERS）
         """
         self.output_dir = Path(output_dir)
         self.temp_dir = Path(temp_dir) if temp_dir else Path(tempfile.gettempdir()) / "manga_temp"
         self.enable_metadata = enable_metadata
         self.dry_run = dry_run
+        self.compression = compression
+        self.inner_workers = inner_workers or self.INNER_RAR_WORKERS
 
         # 创建目录
         if not dry_run:
             self.output_dir.mkdir(parents=True, exist_ok=True)
             self.temp_dir.mkdir(parents=True, exist_ok=True)
 
+        # CBZ先在临时目录生成再移动到输出目录；同一文件系统时为原子重命名
+        self._same_fs = False
+        if not dry_run:
+            self._same_fs = os.stat(self.temp_dir).st_dev == os.stat(self.output_dir).st_dev
+
         # 初始化跟踪器
         self.tracker = SimpleTracker()
+        self._pending_marks: List[str] = []
+        self._last_mark_flush = time.time()
 
         # 初始化元数据API
         if enable_metadata:
@@ -161,6 +284,12 @@ class NestedRARProcessorV2:
             self.bangumi_api = None
             self.anilist_api = None
 
+        # 元数据缓存：系列名 -> (获取时间, 元数据)，未找到的结果也缓存，避免重复请求
+        self.metadata_cache_file = Path(metadata_cache_file)
+        self._meta_cache: Dict[str, Tuple[float, Optional[MangaMetadata]]] = {}
+        if enable_metadata:
+            self._load_metadata_cache()
+
         # ComicInfo生成器
         self.comicinfo_gen = ComicInfoGenerator()
 
@@ -190,18 +319,16 @@ class NestedRARProcessorV2:
         name = Path(filename).stem
 
         # 移除日文标记
-        for pattern in self.JAPANESE_TAG_PATTERNS:
-            name = re.sub(pattern, '', name)
+        name = self._JP_TAG_RE.sub('', name)
 
         # 移除"全X巻"等标记
-        name = re.sub(r'全\d+巻', '', name)
-        name = re.sub(r'全\d+卷', '', name)
+        name = self._QUAN_RE.sub('', name)
 
         # 移除引号标记
-        name = re.sub(r'[「」『』\[\]（）()]', '', name)
+        name = self._QUOTE_RE.sub('', name)
 
         # 清理多余空格
-        name = re.sub(r'\s+', ' ', name).strip()
+        name = self._WS_RE.sub(' ', name).strip()
         name = name.strip(' -_')
 
         return name
@@ -218,8 +345,8 @@ class NestedRARProcessorV2:
         """
         name = Path(filename).stem
 
-        for pattern, _ in self.VOLUME_PATTERNS:
-            match = re.search(pattern, name)
+        for pattern, _ in self._VOL_RES:
+            match = pattern.search(name)
             if match:
                 try:
                     return int(match.group(1))
@@ -241,86 +368,178 @@ class NestedRARProcessorV2:
         if not self.enable_metadata:
             return None
 
+        # 检查缓存
+        cache_key = series_name.lower().strip()
+        cached = self._meta_cache.get(cache_key)
+        if cached and time.time() - cached[0] < self.METADATA_CACHE_TTL:
+            logger.info(f"使用缓存的元数据: {series_name}")
+            return cached[1]
+
+        metadata, definitive = self._fetch_metadata_remote(series_name)
+        if definitive:
+            self._meta_cache[cache_key] = (time.time(), metadata)
+        return metadata
+
+    def _fetch_metadata_remote(self, series_name: str) -> Tuple[Optional[MangaMetadata], bool]:
+        """
+        从Bangumi/AniList获取元数据
+
+        Args:
+            series_name: 系列名
+
+        Returns:
+            (元数据对象或None, 结果是否可缓存)。
+            请求失败（超时、限流等）导致的None不可缓存，下次处理同系列时重新查询
+        """
         logger.info(f"正在获取元数据: {series_name}")
+        request_failed = False
 
         # 优先尝试Bangumi
         if self.bangumi_api:
             try:
-                metadata = self.bangumi_api.search_manga(series_name)
+                metadata = self.bangumi_api.search_manga(series_name, raise_errors=True)
                 if metadata:
                     logger.info(f"从Bangumi获取到元数据: {metadata.title_zh or metadata.title}")
-                    return metadata
+                    return metadata, True
             except Exception as e:
                 logger.warning(f"Bangumi API失败: {e}")
+                request_failed = True
 
         # 备用AniList
         if self.anilist_api:
             try:
-                metadata = self.anilist_api.search_manga(series_name)
+                metadata = self.anilist_api.search_manga(series_name, raise_errors=True)
                 if metadata:
                     logger.info(f"从AniList获取到元数据: {metadata.title}")
-                    return metadata
+                    return metadata, True
             except Exception as e:
                 logger.warning(f"AniList API失败: {e}")
+                request_failed = True
+
+        if request_failed:
+            logger.warning(f"元数据查询失败，暂不缓存: {series_name}")
+            return None, False
 
         logger.warning(f"未找到元数据: {series_name}")
-        return None
+        return None, True
 
-    def _is_nested_rar(self, rar_path: Path) -> Tuple[bool, int]:
+    def prefetch_metadata(self, rar_files: List[Path]):
         """
-        检测是否为嵌套RAR
+        批量预取元数据（解压前并发查询所有未缓存的系列，结果写入缓存）
 
         Args:
-            rar_path: RAR文件路径
-
-        Returns:
-            (是否嵌套, 内层RAR数量)
+            rar_files: RAR文件列表
         """
+        if not self.enable_metadata:
+            return
+
+        # 收集未缓存的系列名（同一系列只查询一次）
+        now = time.time()
+        series_names: Dict[str, str] = {}
+        for rar_file in rar_files:
+            series_name = self._clean_series_name(rar_file.name)
+            cache_key = series_name.lower().strip()
+            cached = self._meta_cache.get(cache_key)
+            if cached and now - cached[0] < self.METADATA_CACHE_TTL:
+                continue
+            series_names.setdefault(cache_key, series_name)
+
+        if not series_names:
+            return
+
+        logger.info(f"预取 {len(series_names)} 个系列的元数据...")
+
+        # 各API客户端自带线程安全的速率限制，并发只用于重叠网络等待
+        workers = min(self.PREFETCH_WORKERS, len(series_names))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(self._fetch_metadata_remote, series_name): cache_key
+                       for cache_key, series_name in series_names.items()}
+            for future in as_completed(futures):
+                metadata, definitive = future.result()
+                if definitive:
+                    self._meta_cache[futures[future]] = (time.time(), metadata)
+
+        self.save_metadata_cache()
+
+    def _load_metadata_cache(self):
+        """加载元数据缓存（跳过已过期的条目）"""
+        if not self.metadata_cache_file.exists():
+            return
+
         try:
-            with rarfile.RarFile(str(rar_path)) as rf:
-                inner_rars = []
-                for name in rf.namelist():
-                    ext = Path(name).suffix.lower()
-                    if ext in self.RAR_EXTENSIONS:
-                        inner_rars.append(name)
+            data = _read_json(self.metadata_cache_file)
+
+            now = time.time()
+            for key, entry in data.items():
+                if now - entry['timestamp'] >= self.METADATA_CACHE_TTL:
+                    continue
+                metadata = MangaMetadata(**entry['metadata']) if entry['metadata'] else None
+                self._meta_cache[key] = (entry['timestamp'], metadata)
 
-                return len(inner_rars) > 0, len(inner_rars)
+            logger.info(f"加载元数据缓存: {len(self._meta_cache)} 条")
+        except Exception as e:
+            logger.warning(f"加载元数据缓存失败: {e}")
+
+    def save_metadata_cache(self):
+        """保存元数据缓存"""
+        if not self.enable_metadata or self.dry_run:
+            return
+
+        data = {
+            key: {
+                'timestamp': timestamp,
+                'metadata': metadata
+            }
+            for key, (timestamp, metadata) in self._meta_cache.items()
+        }
+
+        try:
+            self.metadata_cache_file.parent.mkdir(parents=True, exist_ok=True)
+            temp_file = self.metadata_cache_file.with_suffix('.tmp')
+            _write_json(temp_file, data)
+            temp_file.replace(self.metadata_cache_file)
         except Exception as e:
-            logger.error(f"检测嵌套RAR失败 {rar_path}: {e}")
-            return False, 0
+            logger.warning(f"保存元数据缓存失败: {e}")
 
-    def _create_cbz_from_directory(self, source_dir: Path, cbz_path: Path) -> bool:
+    def _find_inner_rars(self, names: List[str]) -> List[str]:
+        """
+        从压缩包文件列表中找出内层RAR
+
+        Args:
+            names: 压缩包内文件名列表
+
+        Returns:
+            内层RAR文件名列表
+        """
+        return [name for name in names if Path(name).suffix.lower() in self.RAR_EXTENSIONS]
+
+    def _create_cbz_from_directory(self, source_dir: Path, cbz_path: Path,
+                                   comicinfo_xml: Optional[bytes] = None) -> bool:
         """
         从目录创建CBZ文件
 
         Args:
             source_dir: 源目录
             cbz_path: CBZ文件路径
+            comicinfo_xml: ComicInfo.xml内容（可选，打包时一并写入，无需再次改写CBZ）
 
         Returns:
             是否成功
         """
         try:
             # 收集所有图片文件
-            image_files = []
-            for ext in self.IMAGE_EXTENSIONS:
-                image_files.extend(source_dir.rglob(f'*{ext}'))
-                image_files.extend(source_dir.rglob(f'*{ext.upper()}'))
+            image_files = list(_iter_files_by_ext(source_dir, self._IMG_EXT_NODOT))
 
             if not image_files:
                 logger.warning(f"未找到图片文件: {source_dir}")
                 return False
 
-            # 排序
-            image_files.sort()
-
             logger.info(f"找到 {len(image_files)} 个图片文件，正在打包...")
 
-            # 创建CBZ
-            with zipfile.ZipFile(cbz_path, 'w', zipfile.ZIP_DEFLATED) as zf:
-                for img_file in image_files:
-                    arcname = img_file.relative_to(source_dir)
-                    zf.write(img_file, arcname)
+            # 按压缩包内路径自然排序（2 < 10），排序键每个文件只计算一次
+            entries = [(img_file.relative_to(source_dir).as_posix(), img_file, 0) for img_file in image_files]
+            entries.sort(key=lambda entry: _natural_sort_key(entry[0]))
+            self._write_cbz(cbz_path, entries, lambda path: open(path, 'rb', buffering=0), comicinfo_xml)
 
             logger.info(f"创建CBZ成功: {cbz_path.name}")
             return True
@@ -329,105 +548,171 @@ class NestedRARProcessorV2:
             logger.error(f"创建CBZ失败 {cbz_path}: {e}")
             return False
 
-    def _process_single_rar(self, rar_path: Path, metadata: Optional[MangaMetadata]) -> List[str]:
+    def _create_cbz_from_archive(self, rf: rarfile.RarFile, members: List[rarfile.RarInfo],
+                                 cbz_path: Path, comicinfo_xml: Optional[bytes] = None) -> bool:
         """
-        处理单个RAR文件（可能嵌套）
+        直接从RAR读取图片写入CBZ（不经过临时目录）
 
         Args:
-            rar_path: RAR文件路径
-            metadata: 元数据对象
+            rf: 已打开的RAR文件
+            members: 要打包的图片成员（已排序）
+            cbz_path: CBZ文件路径
+            comicinfo_xml: ComicInfo.xml内容（可选）
 
         Returns:
-            生成的CBZ文件路径列表
+            是否成功
         """
-        start_time = time.time()
-        output_files = []
-
-        # 创建临时目录
-        temp_root = self.temp_dir / f"temp_{int(time.time())}_{rar_path.stem}"
-        temp_root.mkdir(parents=True, exist_ok=True)
-
         try:
-            # 检测嵌套
-            is_nested, inner_count = self._is_nested_rar(rar_path)
+            logger.info(f"找到 {len(members)} 个图片文件，直接从RAR打包...")
 
-            if is_nested:
-                logger.info(f"检测到嵌套RAR，包含 {inner_count} 个内层RAR")
+            entries = [(member.filename.replace('\\', '/'), member, member.file_size) for member in members]
+            self._write_cbz(cbz_path, entries, rf.open, comicinfo_xml)
 
-                # 解压外层
-                outer_extract_dir = temp_root / "outer"
-                outer_extract_dir.mkdir(exist_ok=True)
+            logger.info(f"创建CBZ成功: {cbz_path.name}")
+            return True
 
-                logger.info("解压外层RAR...")
-                with rarfile.RarFile(str(rar_path)) as rf:
-                    rf.extractall(str(outer_extract_dir))
+        except Exception as e:
+            logger.error(f"创建CBZ失败 {cbz_path}: {e}")
+            return False
 
-                # 查找内层RAR
-                inner_rars = []
-                for ext in self.RAR_EXTENSIONS:
-                    inner_rars.extend(outer_extract_dir.rglob(f'*{ext}'))
+    def _write_cbz(self, cbz_path: Path, entries: Iterable[Tuple[str, Any, int]],
+                   open_source: Callable[[Any], BinaryIO], comicinfo_xml: Optional[bytes] = None):
+        """
+        写入CBZ文件
 
-                logger.info(f"找到 {len(inner_rars)} 个内层RAR文件")
+        Args:
+            cbz_path: CBZ文件路径
+            entries: (压缩包内路径, 数据源, 原始大小) 列表，大小未知时为0
+            open_source: 打开数据源的函数，返回支持readinto的二进制流
+            comicinfo_xml: ComicInfo.xml内容（可选）
+        """
+        compress_type = self.COMPRESSION_TYPES[self.compression]
+
+        # 复用同一个缓冲区逐块复制，减少小块读写的系统调用
+        buffer = bytearray(self.COPY_BUFFER_SIZE)
+        view = memoryview(buffer)
+
+        with zipfile.ZipFile(cbz_path, 'w', compress_type, allowZip64=True) as zf:
+            for arcname, source, file_size in entries:
+                # 成员元数据全部预先填好，不对源文件做stat
+                zinfo = zipfile.ZipInfo(arcname, date_time=self.ZIP_DATE_TIME)
+                zinfo.compress_type = compress_type
+                zinfo.create_system = 3
+                zinfo.external_attr = self.ZIP_EXTERNAL_ATTR
+                zinfo.file_size = file_size
+
+                with zf.open(zinfo, 'w') as dst, open_source(source) as src:
+                    while True:
+                        n = src.readinto(buffer)
+                        if not n:
+                            break
+                        dst.write(view[:n])
+
+            if comicinfo_xml:
+                zf.writestr('ComicInfo.xml', comicinfo_xml, compress_type=compress_type)
+
+    def _build_comicinfo(self, metadata: Optional[MangaMetadata],
+                         volume_num: Optional[int]) -> Optional[bytes]:
+        """
+        生成ComicInfo.xml内容
 
-                # 处理每个内层RAR
-                for idx, inner_rar in enumerate(sorted(inner_rars), 1):
-                    logger.info(f"处理内层RAR [{idx}/{len(inner_rars)}]: {inner_rar.name}")
+        Args:
+            metadata: 元数据对象
+            volume_num: 卷号
 
-                    # 提取卷号
-                    volume_num = self._extract_volume_number(inner_rar.name)
+        Returns:
+            UTF-8编码的XML，无元数据或生成失败时返回None
+        """
+        if not metadata:
+            return None
 
-                    # 解压内层RAR
-                    inner_extract_dir = temp_root / f"inner_{idx}"
-                    inner_extract_dir.mkdir(exist_ok=True)
+        try:
+            return self.comicinfo_gen.generate(metadata, volume_num).encode('utf-8')
+        except Exception as e:
+            logger.warning(f"生成ComicInfo失败: {e}")
+            return None
 
-                    with rarfile.RarFile(str(inner_rar)) as rf:
-                        rf.extractall(str(inner_extract_dir))
+    def _publish_cbz(self, cbz_tmp: Path, cbz_path: Path):
+        """
+        将临时目录中完成的CBZ移动到输出目录（输出目录中不会出现写了一半的CBZ）
 
-                    # 生成CBZ文件名
-                    if metadata and metadata.title_zh:
-                        series_title = metadata.title_zh
-                    elif metadata:
-                        series_title = metadata.title
-                    else:
-                        series_title = self._clean_series_name(rar_path.name)
+        Args:
+            cbz_tmp: 临时CBZ路径
+            cbz_path: 最终CBZ路径
+        """
+        if self._same_fs:
+            os.replace(cbz_tmp, cbz_path)
+            return
 
-                    if volume_num:
-                        cbz_name = f"{series_title} v{volume_num:02d}.cbz"
-                    else:
-                        cbz_name = f"{series_title} {idx:02d}.cbz"
+        # 跨文件系统：先复制到输出目录中的临时文件名，再原子重命名为最终文件名
+        part_path = cbz_path.with_name(f".{cbz_path.name}.{os.getpid()}.part")
+        try:
+            shutil.copyfile(cbz_tmp, part_path)
+            os.replace(part_path, cbz_path)
+        except BaseException:
+            if part_path.exists():
+                part_path.unlink()
+            raise
+        cbz_tmp.unlink()
 
-                    # 清理非法字符
-                    cbz_name = re.sub(r'[<>:"/\\|?*]', '', cbz_name)
+    def _process_single_rar(self, rar_path: Path, metadata: Optional[MangaMetadata]) -> List[str]:
+        """
+        处理单个RAR文件（可能嵌套）
 
-                    cbz_path = self.output_dir / cbz_name
+        Args:
+            rar_path: RAR文件路径
+            metadata: 元数据对象
 
-                    # 创建CBZ
-                    if self._create_cbz_from_directory(inner_extract_dir, cbz_path):
-                        # 生成并嵌入ComicInfo.xml
-                        if metadata:
-                            try:
-                                comicinfo_xml = self.comicinfo_gen.generate(metadata, volume_num)
-                                self.comicinfo_gen.embed_into_cbz(cbz_path, comicinfo_xml)
-                            except Exception as e:
-                                logger.warning(f"嵌入ComicInfo失败: {e}")
+        Returns:
+            生成的CBZ文件路径列表
+        """
+        start_time = time.time()
+        output_files = []
 
-                        output_files.append(str(cbz_path))
+        # 创建临时目录（mkdtemp保证多进程并行时目录名唯一）
+        temp_root = Path(tempfile.mkdtemp(prefix=f"{rar_path.stem}_", dir=str(self.temp_dir)))
 
-                    # 立即清理该内层RAR的临时目录（节省空间，避免混淆）
-                    if inner_extract_dir.exists():
-                        shutil.rmtree(inner_extract_dir, ignore_errors=True)
-                        logger.info(f"已清理临时目录: inner_{idx}")
+        try:
+            # 只打开一次外层RAR：读取文件列表检测嵌套，再用同一句柄解压
+            with rarfile.RarFile(str(rar_path)) as rf:
+                inner_count = len(self._find_inner_rars(rf.namelist()))
+                is_nested = inner_count > 0
 
-            else:
-                # 非嵌套RAR，直接处理
-                logger.info("非嵌套RAR，直接处理")
+                if is_nested:
+                    logger.info(f"检测到嵌套RAR，包含 {inner_count} 个内层RAR")
+                    extract_dir = temp_root / "outer"
+                    logger.info("解压外层RAR...")
+                else:
+                    logger.info("非嵌套RAR，直接处理")
+                    extract_dir = temp_root / "extract"
 
-                extract_dir = temp_root / "extract"
                 extract_dir.mkdir(exist_ok=True)
+                rf.extractall(str(extract_dir))
+
+            if is_nested:
+                # 查找内层RAR
+                inner_rars = sorted(_iter_files_by_ext(extract_dir, self._RAR_EXT_NODOT))
 
-                with rarfile.RarFile(str(rar_path)) as rf:
-                    rf.extractall(str(extract_dir))
+                logger.info(f"找到 {len(inner_rars)} 个内层RAR文件")
+
+                # 并行处理每个内层RAR（解压由UnRAR子进程完成，不受GIL限制）
+                inner_results: Dict[int, str] = {}
+                workers = min(self.inner_workers, len(inner_rars)) or 1
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    futures = {
+                        executor.submit(self._process_inner_rar, idx, len(inner_rars), inner_rar,
+                                        temp_root, rar_path, metadata): idx
+                        for idx, inner_rar in enumerate(inner_rars, 1)
+                    }
+                    for future in as_completed(futures):
+                        cbz_file = future.result()
+                        if cbz_file:
+                            inner_results[futures[future]] = cbz_file
+
+                # 按内层RAR顺序输出
+                output_files.extend(inner_results[idx] for idx in sorted(inner_results))
 
+            else:
                 # 生成文件名
                 if metadata and metadata.title_zh:
                     series_title = metadata.title_zh
@@ -443,19 +728,14 @@ class NestedRARProcessorV2:
                 else:
                     cbz_name = f"{series_title}.cbz"
 
-                cbz_name = re.sub(r'[<>:"/\\|?*]', '', cbz_name)
+                cbz_name = self._ILLEGAL_RE.sub('', cbz_name)
                 cbz_path = self.output_dir / cbz_name
+                cbz_tmp = temp_root / cbz_name
 
-                # 创建CBZ
-                if self._create_cbz_from_directory(extract_dir, cbz_path):
-                    # 生成并嵌入ComicInfo.xml
-                    if metadata:
-                        try:
-                            comicinfo_xml = self.comicinfo_gen.generate(metadata, volume_num)
-                            self.comicinfo_gen.embed_into_cbz(cbz_path, comicinfo_xml)
-                        except Exception as e:
-                            logger.warning(f"嵌入ComicInfo失败: {e}")
-
+                # 创建CBZ（同时写入ComicInfo.xml）
+                comicinfo_xml = self._build_comicinfo(metadata, volume_num)
+                if self._create_cbz_from_directory(extract_dir, cbz_tmp, comicinfo_xml):
+                    self._publish_cbz(cbz_tmp, cbz_path)
                     output_files.append(str(cbz_path))
 
         finally:
@@ -468,12 +748,93 @@ class NestedRARProcessorV2:
 
         return output_files
 
-    def process_file(self, rar_path: Path) -> ProcessResult:
+    def _process_inner_rar(self, idx: int, total: int, inner_rar: Path, temp_root: Path,
+                           rar_path: Path, metadata: Optional[MangaMetadata]) -> Optional[str]:
+        """
+        处理单个内层RAR（解压、打包CBZ、嵌入ComicInfo、清理临时目录）
+
+        Args:
+            idx: 内层RAR序号（从1开始）
+            total: 内层RAR总数
+            inner_rar: 内层RAR文件路径
+            temp_root: 临时根目录
+            rar_path: 外层RAR文件路径
+            metadata: 元数据对象
+
+        Returns:
+            生成的CBZ文件路径，失败返回None
+        """
+        logger.info(f"处理内层RAR [{idx}/{total}]: {inner_rar.name}")
+
+        # 提取卷号
+        volume_num = self._extract_volume_number(inner_rar.name)
+
+        # 生成CBZ文件名
+        if metadata and metadata.title_zh:
+            series_title = metadata.title_zh
+        elif metadata:
+            series_title = metadata.title
+        else:
+            series_title = self._clean_series_name(rar_path.name)
+
+        if volume_num:
+            cbz_name = f"{series_title} v{volume_num:02d}.cbz"
+        else:
+            cbz_name = f"{series_title} {idx:02d}.cbz"
+
+        # 清理非法字符
+        cbz_name = self._ILLEGAL_RE.sub('', cbz_name)
+
+        cbz_path = self.output_dir / cbz_name
+        cbz_tmp = temp_root / f"inner_{idx}_{cbz_name}"
+        comicinfo_xml = self._build_comicinfo(metadata, volume_num)
+
+        inner_extract_dir = temp_root / f"inner_{idx}"
+
+        try:
+            with rarfile.RarFile(str(inner_rar)) as rf:
+                image_members = sorted(
+                    (info for info in rf.infolist()
+                     if not info.is_dir() and Path(info.filename).suffix.lower() in self.IMAGE_EXTENSIONS),
+                    key=lambda info: _natural_sort_key(info.filename)
+                )
+
+                # 非固实、未加密且图片均为存储模式时，rarfile可直接读取原始数据（不调用UnRAR），
+                # 直接写入CBZ；否则逐个读取需要为每个文件启动UnRAR，不如整体解压到临时目录
+                can_stream = (
+                    image_members
+                    and not rf.is_solid()
+                    and not rf.needs_password()
+                    and all(info.compress_type == rarfile.RAR_M0 for info in image_members)
+                )
+
+                if can_stream:
+                    created = self._create_cbz_from_archive(rf, image_members, cbz_tmp, comicinfo_xml)
+                else:
+                    # 解压内层RAR
+                    inner_extract_dir.mkdir(exist_ok=True)
+                    rf.extractall(str(inner_extract_dir))
+                    created = self._create_cbz_from_directory(inner_extract_dir, cbz_tmp, comicinfo_xml)
+
+            if not created:
+                return None
+
+            self._publish_cbz(cbz_tmp, cbz_path)
+            return str(cbz_path)
+
+        finally:
+            # 立即清理该内层RAR的临时目录（节省空间，避免混淆）
+            if inner_extract_dir.exists():
+                shutil.rmtree(inner_extract_dir, ignore_errors=True)
+                logger.info(f"已清理临时目录: inner_{idx}")
+
+    def process_file(self, rar_path: Path, metadata: Optional[MangaMetadata] = None) -> ProcessResult:
         """
         处理单个文件（原子操作）
 
         Args:
             rar_path: RAR文件路径
+            metadata: 已获取的元数据（None则按系列名查询）
 
         Returns:
             处理结果
@@ -488,7 +849,8 @@ class NestedRARProcessorV2:
         series_name = self._clean_series_name(rar_path.name)
 
         # 获取元数据
-        metadata = self._fetch_metadata(series_name)
+        if metadata is None:
+            metadata = self._fetch_metadata(series_name)
 
         metadata_found = metadata is not None
         metadata_source = metadata.source if metadata else None
@@ -531,50 +893,136 @@ class NestedRARProcessorV2:
 
             return result
 
-    def process_batch(self, rar_files: List[Path], max_files: Optional[int] = None):
+    def process_batch(self, rar_files: List[Path], max_files: Optional[int] = None,
+                      workers: int = 1):
         """
         批量处理文件
 
         Args:
             rar_files: RAR文件列表
             max_files: 最大处理文件数
+            workers: 并行进程数（1则在当前进程中顺序处理）
         """
         self.stats['total'] = len(rar_files)
 
+        # 只在主进程提示一次（子进程各自创建处理器，不在__init__中提示）
+        if not self.dry_run and not self._same_fs:
+            logger.warning("临时目录与输出目录不在同一文件系统，CBZ需要额外复制一次；"
+                           "建议用 --temp 指定与输出目录同一磁盘上的目录")
+
         if max_files:
             rar_files = rar_files[:max_files]
             logger.info(f"限制处理前 {max_files} 个文件")
 
-        for idx, rar_file in enumerate(rar_files, 1):
-            logger.info(f"\n进度: [{idx}/{len(rar_files)}] {rar_file.name}")
-
-            # 检查是否已处理
+        # 检查是否已处理（在主进程中完成，只提交未处理的文件）
+        pending_files = []
+        for rar_file in rar_files:
             if self.tracker.is_completed(str(rar_file)):
-                logger.info("已处理，跳过")
+                logger.info(f"已处理，跳过: {rar_file.name}")
                 self.stats['skipped'] += 1
-                continue
+            else:
+                pending_files.append(rar_file)
 
-            # 处理文件
-            result = self.process_file(rar_file)
-            self.results.append(result)
-
-            # 更新统计
-            if result.success:
-                self.stats['processed'] += 1
-                if result.metadata_found:
-                    self.stats['metadata_found'] += 1
-                else:
-                    self.stats['metadata_failed'] += 1
+        # 解压前统一获取元数据，处理循环中直接命中缓存
+        self.prefetch_metadata(pending_files)
 
-                # 标记为已完成（原子操作的最后一步）
-                self.tracker.mark_completed(str(rar_file))
-                logger.info("✓ 已标记为完成")
-            else:
-                self.stats['failed'] += 1
+        try:
+            self._run_batch(pending_files, workers)
+        finally:
+            # 写入剩余的完成标记，并把跟踪日志合并到快照
+            self._flush_marks()
+            self.tracker.snapshot()
 
         # 打印最终统计
         self.print_summary()
 
+    def _run_batch(self, pending_files: List[Path], workers: int):
+        """
+        处理待处理文件（多进程或当前进程顺序处理）
+
+        Args:
+            pending_files: 待处理文件列表
+            workers: 并行进程数
+        """
+        total = len(pending_files)
+
+        if workers > 1 and total > 1:
+            logger.info(f"使用 {workers} 个进程并行处理 {total} 个文件")
+            initargs = (str(self.output_dir), str(self.temp_dir), self.dry_run, self.compression)
+
+            # 元数据由主进程获取（预取后通常命中缓存）再随任务传给子进程，
+            # 所有API请求共用主进程的速率限制
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=initargs) as executor:
+                futures = {
+                    executor.submit(_process_file_worker, rar_file,
+                                    self._fetch_metadata(self._clean_series_name(rar_file.name))): rar_file
+                    for rar_file in pending_files
+                }
+
+                for idx, future in enumerate(as_completed(futures), 1):
+                    rar_file = futures[future]
+                    logger.info(f"\n进度: [{idx}/{total}] {rar_file.name}")
+
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logger.error(f"✗ 子进程处理失败: {e}")
+                        result = ProcessResult(
+                            original_path=str(rar_file),
+                            series_name=self._clean_series_name(rar_file.name),
+                            output_files=[],
+                            metadata_found=False,
+                            metadata_source=None,
+                            success=False,
+                            error=str(e)
+                        )
+
+                    self._record_result(rar_file, result)
+        else:
+            for idx, rar_file in enumerate(pending_files, 1):
+                logger.info(f"\n进度: [{idx}/{total}] {rar_file.name}")
+
+                # 处理文件
+                result = self.process_file(rar_file)
+                self._record_result(rar_file, result)
+
+    def _record_result(self, rar_file: Path, result: ProcessResult):
+        """
+        记录处理结果并更新统计（只在主进程中调用）
+
+        Args:
+            rar_file: RAR文件路径
+            result: 处理结果
+        """
+        self.results.append(result)
+
+        # 更新统计
+        if result.success:
+            self.stats['processed'] += 1
+            if result.metadata_found:
+                self.stats['metadata_found'] += 1
+            else:
+                self.stats['metadata_failed'] += 1
+
+            # 标记为已完成（原子操作的最后一步，批量写入跟踪文件）
+            self._pending_marks.append(str(rar_file))
+            logger.info("✓ 已加入完成队列")
+            if (len(self._pending_marks) >= self.MARK_FLUSH_COUNT
+                    or time.time() - self._last_mark_flush >= self.MARK_FLUSH_INTERVAL):
+                self._flush_marks()
+        else:
+            self.stats['failed'] += 1
+
+    def _flush_marks(self):
+        """将累计的完成标记写入跟踪文件"""
+        if self._pending_marks:
+            count = len(self._pending_marks)
+            self.tracker.mark_completed_many(self._pending_marks)
+            self._pending_marks.clear()
+            logger.info(f"✓ 已将 {count} 个文件标记为完成")
+        self._last_mark_flush = time.time()
+
     def print_summary(self):
         """打印处理摘要"""
         logger.info(f"\n{'='*80}")
@@ -591,23 +1039,97 @@ class NestedRARProcessorV2:
         logger.info(f"\n总已完成数: {tracker_stats['total_completed']}")
         logger.info(f"{'='*80}\n")
 
+        self.save_metadata_cache()
+
     def save_report(self, report_path: str):
         """保存处理报告"""
         report = {
             'timestamp': datetime.now().isoformat(),
             'stats': self.stats,
             'tracker_stats': self.tracker.get_stats(),
-            'results': [asdict(r) for r in self.results]
+            'results': self.results
         }
 
-        with open(report_path, 'w', encoding='utf-8') as f:
-            json.dump(report, f, ensure_ascii=False, indent=2)
+        _write_json(Path(report_path), report)
 
         logger.info(f"报告已保存: {report_path}")
 
 
+# 子进程中的处理器实例（由_init_worker创建）
+_worker_processor: Optional[NestedRARProcessorV2] = None
+
+
+def _init_worker(output_dir: str, temp_dir: str, dry_run: bool, compression: str):
+    """
+    进程池初始化：每个子进程创建一个处理器
+
+    子进程不访问元数据API（元数据由主进程传入），内层RAR顺序解压，
+    使同时进行的解压数不超过进程数
+    """
+    global _worker_processor
+    _worker_processor = NestedRARProcessorV2(
+        output_dir=output_dir,
+        temp_dir=temp_dir,
+        enable_metadata=False,
+        dry_run=dry_run,
+        compression=compression,
+        inner_workers=1
+    )
+
+
+def _process_file_worker(rar_file: Path, metadata: Optional[MangaMetadata]) -> ProcessResult:
+    """在子进程中处理单个文件（完成标记由主进程负责）"""
+    return _worker_processor.process_file(rar_file, metadata)
+
+
+def _init_windows_console():
+    """Windows下设置UTF-8控制台输出并修复sys.argv的Unicode编码（仅命令行入口调用）"""
+    if sys.platform != 'win32':
+        return
+
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+    # 日志在导入时已配置，控制台handler需改为输出到新的stderr
+    for handler in logging.getLogger().handlers:
+        if type(handler) is logging.StreamHandler:
+            handler.setStream(sys.stderr)
+
+    # 修复Windows下sys.argv的Unicode编码问题
+    try:
+        from ctypes import POINTER, byref, cdll, c_int, windll
+        from ctypes.wintypes import LPCWSTR, LPWSTR
+
+        GetCommandLineW = cdll.kernel32.GetCommandLineW
+        GetCommandLineW.argtypes = []
+        GetCommandLineW.restype = LPCWSTR
+
+        CommandLineToArgvW = windll.shell32.CommandLineToArgvW
+        CommandLineToArgvW.argtypes = [LPCWSTR, POINTER(c_int)]
+        CommandLineToArgvW.restype = POINTER(LPWSTR)
+
+        cmd = GetCommandLineW()
+        argc = c_int(0)
+        argv_unicode = CommandLineToArgvW(cmd, byref(argc))
+
+        argv_list = [argv_unicode[i] for i in range(argc.value)]
+
+        script_index = 0
+        for i, arg in enumerate(argv_list):
+            if arg.endswith('.py'):
+                script_index = i
+                break
+
+        if script_index > 0:
+            sys.argv = argv_list[script_index:]
+    except Exception as e:
+        print(f"Warning: Failed to get Unicode command line arguments: {e}", file=sys.stderr)
+
+
 def main():
     """命令行入口"""
+    _init_windows_console()
+
     parser = argparse.ArgumentParser(description='嵌套RAR处理器 V2 - 集成元数据')
     parser.add_argument('--input', '-i', help='输入目录或文件')
     parser.add_argument('--output', '-o', help='输出目录')
@@ -617,6 +1139,11 @@ def main():
     parser.add_argument('--report', '-r', help='保存处理报告')
     parser.add_argument('--no-metadata', action='store_true', help='禁用元数据获取')
     parser.add_argument('--use-config', action='store_true', help='使用config.json中的路径')
+    parser.add_argument('--compression', choices=list(NestedRARProcessorV2.COMPRESSION_TYPES),
+                        default='stored', help='CBZ压缩方式（默认：stored，不压缩）')
+    parser.add_argument('--workers', '-w', type=int, default=os.cpu_count() or 1,
+                        help='并行处理进程数（默认：CPU核心数；大于1时每个进程顺序解压内层RAR，'
+                             '同时进行的解压数不超过进程数。输入位于机械硬盘或网络共享时建议调小）')
 
     args = parser.parse_args()
 
@@ -649,7 +1176,8 @@ def main():
         output_dir=output_dir,
         temp_dir=args.temp,
         enable_metadata=not args.no_metadata,
-        dry_run=args.dry_run
+        dry_run=args.dry_run,
+        compression=args.compression
     )
 
     # 收集RAR文件
@@ -657,10 +1185,8 @@ def main():
     if input_path.is_file():
         rar_files = [input_path]
     elif input_path.is_dir():
-        rar_files = []
-        for ext in NestedRARProcessorV2.RAR_EXTENSIONS:
-            rar_files.extend(input_path.glob(f'*{ext}'))
-        rar_files.sort()
+        rar_files = sorted(_iter_rars(input_path, NestedRARProcessorV2._RAR_EXT_NODOT),
+                           key=lambda p: p.name)
     else:
         logger.error(f"无效的输入路径: {input_path}")
         return
@@ -668,7 +1194,7 @@ def main():
     logger.info(f"找到 {len(rar_files)} 个RAR文件")
 
     # 批量处理
-    processor.process_batch(rar_files, max_files=args.max_files)
+    processor.process_batch(rar_files, max_files=args.max_files, workers=args.workers)
 
     # 保存报告
     if args.report:
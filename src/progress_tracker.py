@@ -4,22 +4,88 @@
 进度跟踪模块
 功能：记录处理进度，支持断点续传
 使用JSON格式，易于阅读和调试
+进度快照之外，每次状态变更追加一行到日志文件（NDJSON），加载时在快照上重放
+安装了msgpack时，文件列表单独保存为msgpack二进制文件，JSON中只保留会话和统计信息；
+msgpack文件名带代数，JSON最后替换，两者始终对应同一次保存
 """
 
+import io
 import json
 import os
+import sys
+import threading
+import time
 from pathlib import Path
-from typing import Dict, List, Optional, Set
-from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional, Set
+from dataclasses import dataclass
 from datetime import datetime
 import logging
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
 logger = logging.getLogger(__name__)
 
 
+def _dumps(data: Any) -> bytes:
+    """
+    序列化为UTF-8编码的紧凑JSON（安装了orjson时使用orjson）
+
+    Args:
+        data: 要序列化的数据
+
+    Returns:
+        JSON字节串
+    """
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _loads(data: bytes) -> Any:
+    """
+    解析JSON（安装了orjson时使用orjson）
+
+    Args:
+        data: JSON字节串
+
+    Returns:
+        解析结果
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data.decode('utf-8'))
+
+
+def _fsync_dir(path: Path) -> None:
+    """
+    同步目录元数据（使文件重命名持久化；Windows不支持打开目录，跳过）
+
+    Args:
+        path: 目录路径
+    """
+    if sys.platform == 'win32':
+        return
+    try:
+        fd = os.open(str(path), os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    except OSError as e:
+        logger.debug(f"同步目录失败 {path}: {e}")
+
+
 @dataclass
 class FileProgress:
-    """单个文件的处理进度"""
+    """单个文件的处理进度（进度文件中每个文件记录的字段）"""
     file_path: str
     status: str  # pending, processing, completed, failed
     started_at: Optional[str] = None
@@ -34,7 +100,12 @@ class FileProgress:
 
 
 class ProgressTracker:
-    """进度跟踪器"""
+    """进度跟踪器（可作为上下文管理器使用，退出时写入所有未保存的进度）"""
+
+    # 累计多少次状态变更后写入进度快照（变更已实时追加到日志文件）
+    FLUSH_EVERY = 500
+    # 距上次写入超过多少秒后写入进度快照
+    FLUSH_INTERVAL = 30.0
 
     def __init__(self, progress_file: str = ".progress/processing_progress.json"):
         """
@@ -45,26 +116,80 @@ class ProgressTracker:
         """
         self.progress_file = Path(progress_file)
         self.progress_file.parent.mkdir(parents=True, exist_ok=True)
+        self.journal_file = self.progress_file.with_suffix('.log')
+        # 当前JSON引用的msgpack文件列表（未使用msgpack时为None）及其代数
+        self.files_file: Optional[Path] = None
+        self._files_gen = 0
 
         self.session_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # 缓存当前秒的ISO时间字符串，同一秒内的状态变更不再重复格式化
+        self._ts_cache = (0, "")
         self.progress_data = self._load_or_create()
+        self._rebuild_index()
+
+        # 合并写入：未写入的状态变更数和上次写入时间
+        self._dirty_count = 0
+        self._last_flush = time.monotonic()
+        self._save_lock = threading.Lock()
+        self._journal = open(self.journal_file, 'ab')
+
+    def _now_iso(self) -> str:
+        """
+        获取当前时间的ISO格式字符串（精确到秒，同一秒内复用）
+
+        Returns:
+            ISO格式时间字符串
+        """
+        second = int(time.time())
+        cached_second, cached_iso = self._ts_cache
+        if second != cached_second:
+            cached_iso = datetime.fromtimestamp(second).isoformat()
+            self._ts_cache = (second, cached_iso)
+        return cached_iso
+
+    def __enter__(self) -> 'ProgressTracker':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """写入所有未保存的进度并关闭日志文件"""
+        self._save_now()
+        self._journal.close()
 
     def _load_or_create(self) -> Dict:
         """加载或创建进度文件"""
         if self.progress_file.exists():
             try:
-                with open(self.progress_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    logger.info(f"加载现有进度文件: {self.progress_file}")
-                    return data
+                with open(self.progress_file, 'rb') as f:
+                    data = _loads(f.read())
+
+                # 文件列表保存在msgpack文件中
+                files_file = data.pop("files_file", None)
+                files_gen = data.pop("files_gen", 0)
+                if files_file:
+                    self.files_file = self.progress_file.parent / files_file
+                    self._files_gen = files_gen
+                    if msgpack is None:
+                        raise ImportError(f"进度文件的文件列表为msgpack格式，请安装msgpack: {self.files_file}")
+                    with open(self.files_file, 'rb') as f:
+                        data["files"] = msgpack.unpackb(f.read(), raw=False)
+
+                logger.info(f"加载现有进度文件: {self.progress_file}")
+                self._replay_journal(data)
+                return data
+            except ImportError:
+                # 缺少依赖时不能当作文件损坏处理，否则会用空进度覆盖现有记录
+                raise
             except Exception as e:
                 logger.error(f"加载进度文件失败: {e}，创建新文件")
 
         # 创建新的进度数据结构
         return {
             "version": "1.0",
-            "created_at": datetime.now().isoformat(),
-            "last_updated": datetime.now().isoformat(),
+            "created_at": self._now_iso(),
+            "last_updated": self._now_iso(),
             "sessions": [],
             "current_session": None,
             "files": {},
@@ -77,6 +202,89 @@ class ProgressTracker:
             }
         }
 
+    def _rebuild_index(self) -> None:
+        """按文件状态重建索引（索引不持久化，加载后重建）"""
+        # 待处理文件用dict保持加入顺序；失败文件记录重试次数
+        self._pending: Dict[str, None] = {}
+        self._processing: Set[str] = set()
+        self._failed: Dict[str, int] = {}
+
+        for file_path, file_data in self.progress_data["files"].items():
+            status = file_data["status"]
+            if status == "pending":
+                self._pending[file_path] = None
+            elif status == "processing":
+                self._processing.add(file_path)
+            elif status == "failed":
+                self._failed[file_path] = file_data["retry_count"]
+
+    def _replay_journal(self, data: Dict) -> None:
+        """
+        在进度快照上重放日志文件中快照之后的状态变更
+
+        日志记录的是变更后的字段值，重放是幂等的；统计信息在重放后按文件状态重新计算
+
+        Args:
+            data: 进度快照数据
+        """
+        if not self.journal_file.exists():
+            return
+
+        replayed = 0
+        with open(self.journal_file, 'rb') as f:
+            for line in f:
+                try:
+                    entry = _loads(line)
+                except ValueError:
+                    # 最后一行可能因中断而写了一半
+                    continue
+
+                file_data = data["files"].get(entry["path"])
+                if file_data is None:
+                    continue
+
+                op = entry["op"]
+                if op == "start":
+                    file_data["status"] = "processing"
+                    file_data["started_at"] = entry["ts"]
+                elif op == "complete":
+                    file_data["status"] = "completed"
+                    file_data["completed_at"] = entry["ts"]
+                    file_data["output_files"] = entry["output_files"]
+                    file_data["error"] = None
+                elif op == "fail":
+                    file_data["status"] = "failed"
+                    file_data["completed_at"] = entry["ts"]
+                    file_data["error"] = entry["error"]
+                    file_data["retry_count"] = entry["retry_count"]
+
+                if "processed_files" in entry and data["current_session"]:
+                    data["current_session"]["processed_files"] = entry["processed_files"]
+                replayed += 1
+
+        if replayed:
+            statistics = data["statistics"]
+            statistics["total_files"] = len(data["files"])
+            for status in ("pending", "processing", "completed", "failed"):
+                statistics[status] = 0
+            for file_data in data["files"].values():
+                statistics[file_data["status"]] += 1
+            logger.info(f"从日志文件重放 {replayed} 条进度记录")
+
+    def _append_journal(self, entry: Dict) -> None:
+        """
+        追加一条状态变更到日志文件
+
+        Args:
+            entry: 变更记录
+        """
+        with self._save_lock:
+            try:
+                self._journal.write(_dumps(entry) + b"\n")
+                self._journal.flush()
+            except Exception as e:
+                logger.error(f"写入进度日志失败: {e}")
+
     def start_session(self, total_files: int, session_name: Optional[str] = None) -> str:
         """
         开始新的处理会话
@@ -91,7 +299,7 @@ class ProgressTracker:
         session = {
             "session_id": self.session_id,
             "session_name": session_name or f"Session_{self.session_id}",
-            "started_at": datetime.now().isoformat(),
+            "started_at": self._now_iso(),
             "completed_at": None,
             "total_files": total_files,
             "processed_files": 0,
@@ -100,7 +308,7 @@ class ProgressTracker:
 
         self.progress_data["current_session"] = session
         self.progress_data["sessions"].append(session)
-        self.save()
+        self.save(force=True)
 
         logger.info(f"开始新会话: {session['session_name']} (ID: {self.session_id})")
         return self.session_id
@@ -113,12 +321,19 @@ class ProgressTracker:
             file_path: 文件路径
         """
         if file_path not in self.progress_data["files"]:
-            self.progress_data["files"][file_path] = asdict(FileProgress(
-                file_path=file_path,
-                status="pending"
-            ))
+            # 直接构造与FileProgress字段一致的字典，省去实例化和asdict深拷贝
+            self.progress_data["files"][file_path] = {
+                "file_path": file_path,
+                "status": "pending",
+                "started_at": None,
+                "completed_at": None,
+                "error": None,
+                "output_files": [],
+                "retry_count": 0
+            }
             self.progress_data["statistics"]["total_files"] += 1
             self.progress_data["statistics"]["pending"] += 1
+            self._pending[file_path] = None
 
     def add_files(self, file_paths: List[str]) -> None:
         """
@@ -129,7 +344,7 @@ class ProgressTracker:
         """
         for file_path in file_paths:
             self.add_file(file_path)
-        self.save()
+        self.save(force=True)
         logger.info(f"添加 {len(file_paths)} 个文件到处理队列")
 
     def start_processing(self, file_path: str) -> None:
@@ -144,7 +359,7 @@ class ProgressTracker:
             old_status = file_data["status"]
 
             file_data["status"] = "processing"
-            file_data["started_at"] = datetime.now().isoformat()
+            file_data["started_at"] = self._now_iso()
 
             # 更新统计
             if old_status == "pending":
@@ -154,6 +369,13 @@ class ProgressTracker:
 
             self.progress_data["statistics"]["processing"] += 1
 
+            self._pending.pop(file_path, None)
+            self._failed.pop(file_path, None)
+            self._processing.add(file_path)
+
+            self._append_journal({"op": "start", "path": file_path, "ts": file_data["started_at"]})
+            self.save()
+
     def mark_completed(self, file_path: str, output_files: List[str]) -> None:
         """
         标记文件处理完成
@@ -166,17 +388,26 @@ class ProgressTracker:
             file_data = self.progress_data["files"][file_path]
 
             file_data["status"] = "completed"
-            file_data["completed_at"] = datetime.now().isoformat()
+            file_data["completed_at"] = self._now_iso()
             file_data["output_files"] = output_files
             file_data["error"] = None
+            entry = {"op": "complete", "path": file_path, "ts": file_data["completed_at"],
+                     "output_files": output_files}
 
             # 更新统计
             self.progress_data["statistics"]["processing"] -= 1
             self.progress_data["statistics"]["completed"] += 1
+            self._pending.pop(file_path, None)
+            self._processing.discard(file_path)
+            self._failed.pop(file_path, None)
 
             # 更新会话进度
             if self.progress_data["current_session"]:
                 self.progress_data["current_session"]["processed_files"] += 1
+                entry["processed_files"] = self.progress_data["current_session"]["processed_files"]
+
+            self._append_journal(entry)
+            self.save()
 
     def mark_failed(self, file_path: str, error: str) -> None:
         """
@@ -190,17 +421,26 @@ class ProgressTracker:
             file_data = self.progress_data["files"][file_path]
 
             file_data["status"] = "failed"
-            file_data["completed_at"] = datetime.now().isoformat()
+            file_data["completed_at"] = self._now_iso()
             file_data["error"] = error
             file_data["retry_count"] += 1
+            entry = {"op": "fail", "path": file_path, "ts": file_data["completed_at"],
+                     "error": error, "retry_count": file_data["retry_count"]}
 
             # 更新统计
             self.progress_data["statistics"]["processing"] -= 1
             self.progress_data["statistics"]["failed"] += 1
+            self._pending.pop(file_path, None)
+            self._processing.discard(file_path)
+            self._failed[file_path] = file_data["retry_count"]
 
             # 更新会话进度
             if self.progress_data["current_session"]:
                 self.progress_data["current_session"]["processed_files"] += 1
+                entry["processed_files"] = self.progress_data["current_session"]["processed_files"]
+
+            self._append_journal(entry)
+            self.save()
 
     def end_session(self, status: str = "completed") -> None:
         """
@@ -210,9 +450,9 @@ class ProgressTracker:
             status: 会话状态 (completed, interrupted, error)
         """
         if self.progress_data["current_session"]:
-            self.progress_data["current_session"]["completed_at"] = datetime.now().isoformat()
+            self.progress_data["current_session"]["completed_at"] = self._now_iso()
             self.progress_data["current_session"]["status"] = status
-            self.save()
+            self.save(force=True)
 
             logger.info(f"会话结束: {self.progress_data['current_session']['session_name']} (状态: {status})")
 
@@ -223,11 +463,7 @@ class ProgressTracker:
         Returns:
             待处理文件列表
         """
-        pending = []
-        for file_path, file_data in self.progress_data["files"].items():
-            if file_data["status"] == "pending":
-                pending.append(file_path)
-        return pending
+        return list(self._pending)
 
     def get_failed_files(self, max_retries: int = 3) -> List[str]:
         """
@@ -239,11 +475,7 @@ class ProgressTracker:
         Returns:
             失败文件列表
         """
-        failed = []
-        for file_path, file_data in self.progress_data["files"].items():
-            if file_data["status"] == "failed" and file_data["retry_count"] < max_retries:
-                failed.append(file_path)
-        return failed
+        return [file_path for file_path, retry_count in self._failed.items() if retry_count < max_retries]
 
     def is_file_processed(self, file_path: str) -> bool:
         """
@@ -279,21 +511,72 @@ class ProgressTracker:
 
         return stats
 
-    def save(self) -> None:
-        """保存进度到文件"""
-        self.progress_data["last_updated"] = datetime.now().isoformat()
+    def save(self, force: bool = False) -> None:
+        """
+        保存进度到文件（合并写入）
 
-        try:
-            # 先写入临时文件
-            temp_file = self.progress_file.with_suffix('.tmp')
-            with open(temp_file, 'w', encoding='utf-8') as f:
-                json.dump(self.progress_data, f, ensure_ascii=False, indent=2)
+        累计FLUSH_EVERY次变更或距上次写入超过FLUSH_INTERVAL秒时才真正写入，
+        避免每处理一个文件就把整个进度数据重写一遍
 
-            # 原子性替换
-            temp_file.replace(self.progress_file)
+        Args:
+            force: 是否立即写入
+        """
+        self._dirty_count += 1
+        if (not force and self._dirty_count < self.FLUSH_EVERY
+                and time.monotonic() - self._last_flush < self.FLUSH_INTERVAL):
+            return
+        self._save_now()
+
+    def _save_now(self) -> None:
+        """立即保存进度到文件"""
+        with self._save_lock:
+            self._dirty_count = 0
+            self._last_flush = time.monotonic()
+            self.progress_data["last_updated"] = self._now_iso()
 
-        except Exception as e:
-            logger.error(f"保存进度文件失败: {e}")
+            try:
+                header = self.progress_data
+                files_file = None
+                if msgpack is not None:
+                    # 文件列表写入新一代的msgpack文件（不覆盖当前JSON引用的文件），JSON中只保留其余部分；
+                    # JSON替换之前崩溃时，旧JSON和旧msgpack文件仍然完整对应
+                    files_gen = self._files_gen + 1
+                    files_file = self.progress_file.with_name(f"{self.progress_file.stem}.{files_gen}.mp")
+                    with open(files_file, 'wb') as f:
+                        f.write(msgpack.packb(self.progress_data["files"], use_bin_type=True))
+                        f.flush()
+                        os.fsync(f.fileno())
+
+                    header = {key: value for key, value in self.progress_data.items() if key != "files"}
+                    header["files_file"] = files_file.name
+                    header["files_gen"] = files_gen
+
+                # 先写入临时文件（进度文件供程序续传读取，使用紧凑格式；可读报告见export_summary）
+                temp_file = self.progress_file.with_suffix('.tmp')
+                with open(temp_file, 'wb') as f:
+                    f.write(_dumps(header))
+                    # 落盘后再替换，避免崩溃后得到空的或截断的进度文件
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                # 原子性替换，并同步目录使重命名本身持久化
+                os.replace(temp_file, self.progress_file)
+                _fsync_dir(self.progress_file.parent)
+
+                # 新JSON已持久化，旧的msgpack文件不再被引用
+                old_files_file = self.files_file
+                self.files_file = files_file
+                if files_file is not None:
+                    self._files_gen = files_gen
+                if old_files_file is not None and old_files_file != files_file and old_files_file.exists():
+                    old_files_file.unlink()
+
+                # 快照已包含全部变更（且已持久化），清空日志文件
+                if not self._journal.closed:
+                    self._journal.truncate(0)
+
+            except Exception as e:
+                logger.error(f"保存进度文件失败: {e}")
 
     def print_summary(self) -> None:
         """打印进度摘要"""
@@ -325,49 +608,50 @@ class ProgressTracker:
         """
         stats = self.get_statistics()
 
+        # 先在内存中拼好整个报告，再一次写入文件
+        buf = io.StringIO()
+        buf.write("="*80 + "\n")
+        buf.write("处理进度报告\n")
+        buf.write("="*80 + "\n\n")
+
+        buf.write(f"生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        buf.write(f"进度文件: {self.progress_file}\n\n")
+
+        buf.write("统计信息:\n")
+        buf.write(f"  总文件数: {stats['total_files']}\n")
+        buf.write(f"  待处理: {stats['pending']}\n")
+        buf.write(f"  处理中: {stats['processing']}\n")
+        buf.write(f"  已完成: {stats['completed']} ({stats['progress_percentage']:.1f}%)\n")
+        buf.write(f"  失败: {stats['failed']} ({stats['failed_percentage']:.1f}%)\n\n")
+
+        # 会话历史
+        if self.progress_data["sessions"]:
+            buf.write("会话历史:\n")
+            for session in self.progress_data["sessions"]:
+                buf.write(f"\n  会话: {session['session_name']}\n")
+                buf.write(f"    ID: {session['session_id']}\n")
+                buf.write(f"    开始: {session['started_at']}\n")
+                if session['completed_at']:
+                    buf.write(f"    结束: {session['completed_at']}\n")
+                buf.write(f"    状态: {session['status']}\n")
+                buf.write(f"    处理文件: {session['processed_files']}/{session['total_files']}\n")
+
+        # 失败文件列表（直接取失败索引，不扫描全部文件）
+        if self._failed:
+            buf.write("\n\n失败文件列表:\n")
+            buf.write("-"*80 + "\n")
+            for file_path in self._failed:
+                file_data = self.progress_data["files"][file_path]
+                file_name = file_path.rsplit('/', 1)[-1].rsplit('\\', 1)[-1]
+                buf.write(f"\n  文件: {file_name}\n")
+                buf.write(f"    路径: {file_path}\n")
+                buf.write(f"    错误: {file_data['error']}\n")
+                buf.write(f"    重试次数: {file_data['retry_count']}\n")
+
+        buf.write("\n" + "="*80 + "\n")
+
         with open(output_file, 'w', encoding='utf-8') as f:
-            f.write("="*80 + "\n")
-            f.write("处理进度报告\n")
-            f.write("="*80 + "\n\n")
-
-            f.write(f"生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write(f"进度文件: {self.progress_file}\n\n")
-
-            f.write("统计信息:\n")
-            f.write(f"  总文件数: {stats['total_files']}\n")
-            f.write(f"  待处理: {stats['pending']}\n")
-            f.write(f"  处理中: {stats['processing']}\n")
-            f.write(f"  已完成: {stats['completed']} ({stats['progress_percentage']:.1f}%)\n")
-            f.write(f"  失败: {stats['failed']} ({stats['failed_percentage']:.1f}%)\n\n")
-
-            # 会话历史
-            if self.progress_data["sessions"]:
-                f.write("会话历史:\n")
-                for session in self.progress_data["sessions"]:
-                    f.write(f"\n  会话: {session['session_name']}\n")
-                    f.write(f"    ID: {session['session_id']}\n")
-                    f.write(f"    开始: {session['started_at']}\n")
-                    if session['completed_at']:
-                        f.write(f"    结束: {session['completed_at']}\n")
-                    f.write(f"    状态: {session['status']}\n")
-                    f.write(f"    处理文件: {session['processed_files']}/{session['total_files']}\n")
-
-            # 失败文件列表
-            failed_files = [
-                (path, data) for path, data in self.progress_data["files"].items()
-                if data["status"] == "failed"
-            ]
-
-            if failed_files:
-                f.write("\n\n失败文件列表:\n")
-                f.write("-"*80 + "\n")
-                for file_path, file_data in failed_files:
-                    f.write(f"\n  文件: {Path(file_path).name}\n")
-                    f.write(f"    路径: {file_path}\n")
-                    f.write(f"    错误: {file_data['error']}\n")
-                    f.write(f"    重试次数: {file_data['retry_count']}\n")
-
-            f.write("\n" + "="*80 + "\n")
+            f.write(buf.getvalue())
 
         logger.info(f"摘要报告已导出: {output_file}")
 
@@ -375,7 +659,8 @@ class ProgressTracker:
         """重置进度（慎用）"""
         logger.warning("重置进度跟踪器")
         self.progress_data = self._load_or_create()
-        self.save()
+        self._rebuild_index()
+        self.save(force=True)
 
     def cleanup_old_sessions(self, keep_last_n: int = 10) -> None:
         """
@@ -388,7 +673,7 @@ class ProgressTracker:
             removed = len(self.progress_data["sessions"]) - keep_last_n
             self.progress_data["sessions"] = self.progress_data["sessions"][-keep_last_n:]
             logger.info(f"清理了 {removed} 个旧会话记录")
-            self.save()
+            self.save(force=True)
 
 
 def main():
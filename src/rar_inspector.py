@@ -12,13 +12,25 @@ import re
 import rarfile
 import json
 import argparse
+import functools
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional, Set, Any
-from dataclasses import dataclass, asdict, field
+from typing import Dict, Iterator, List, Tuple, Optional, Set, Any
+from dataclasses import dataclass, field, fields
 from datetime import datetime
 from collections import defaultdict
 import logging
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from tqdm import tqdm
+except ImportError:
+    tqdm = None
+
 # Windows UTF-8 编码设置
 if sys.platform == 'win32':
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
@@ -38,6 +50,39 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 扩展名、日文标记等在大量压缩包间重复出现的字符串统一驻留，共享同一对象
+_intern = sys.intern
+
+
+def _loads(data: bytes) -> Any:
+    """
+    解析JSON（安装了orjson时使用orjson）
+
+    Args:
+        data: JSON字节串
+
+    Returns:
+        解析结果
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data.decode('utf-8'))
+
+
+def _dumps(data: Any) -> bytes:
+    """
+    序列化为UTF-8编码的JSON（安装了orjson时使用orjson）
+
+    Args:
+        data: 要序列化的数据
+
+    Returns:
+        JSON字节串
+    """
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
 
 @dataclass
 class RARFileInfo:
@@ -58,6 +103,23 @@ class RARFileInfo:
     analysis_errors: Optional[List[str]] = None
 
 
+# RARFileInfo的字段名（输出报告时直接取字段值，避免asdict逐字段深拷贝）
+_RAR_FIELDS = tuple(f.name for f in fields(RARFileInfo))
+
+
+def _rar_info_dict(rar_info: RARFileInfo) -> Dict[str, Any]:
+    """
+    将RARFileInfo转换为字典（浅拷贝，仅用于序列化）
+
+    Args:
+        rar_info: RAR文件信息
+
+    Returns:
+        字段字典
+    """
+    return {name: getattr(rar_info, name) for name in _RAR_FIELDS}
+
+
 class RARInspector:
     """RAR文件探测器"""
 
@@ -84,13 +146,22 @@ class RARInspector:
         r'\s+(\d{2,3})\s*$',
     ]
 
+    # 类定义时编译一次；所有日文标记合并成一个模式
+    _JP_TAG_RE = re.compile('|'.join(JAPANESE_TAG_PATTERNS))
+    _VOL_RES = [re.compile(pattern) for pattern in VOLUME_PATTERNS]
+
     # RAR文件扩展名
-    RAR_EXTENSIONS = {'.rar', '.cbr'}
+    RAR_EXTENSIONS = frozenset({'.rar', '.cbr'})
 
     # 支持的漫画文件类型
-    SUPPORTED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.pdf', '.zip', '.cbz'}
+    SUPPORTED_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.pdf', '.zip', '.cbz'})
+
+    # 分析缓存格式版本
+    CACHE_VERSION = 2
 
-    def __init__(self, target_dir: str, max_depth: int = 10, max_files: Optional[int] = None):
+    def __init__(self, target_dir: str, max_depth: int = 10, max_files: Optional[int] = None,
+                 workers: Optional[int] = None, collect_inner_files: bool = True,
+                 cache_file: Optional[str] = ".progress/rar_inspector_cache.json"):
         """
         初始化探测器
 
@@ -98,10 +169,15 @@ class RARInspector:
             target_dir: 目标目录
             max_depth: 最大嵌套深度
             max_files: 最大扫描文件数（用于测试，None表示无限制）
+            workers: 并行分析的线程数（None表示CPU核心数的2倍）
+            collect_inner_files: 是否记录每个内部文件的信息（只需简单报告时可关闭以节省内存）
+            cache_file: 分析结果缓存文件路径（按文件大小和修改时间判断是否可复用，None表示不缓存）
         """
         self.target_dir = Path(target_dir)
         self.max_depth = max_depth
         self.max_files = max_files
+        self.workers = workers or (os.cpu_count() or 1) * 2
+        self.collect_inner_files = collect_inner_files
         self.rar_files: List[RARFileInfo] = []
         self.stats = {
             'total_rar_files': 0,
@@ -114,6 +190,46 @@ class RARInspector:
         }
         self.file_type_stats = defaultdict(int)
 
+        # 分析结果缓存：路径 -> {mtime, size, info}（info为不含内部文件列表的摘要字段）
+        self.cache_file = Path(cache_file) if cache_file else None
+        self._cache: Dict[str, Dict[str, Any]] = {}
+        self._cache_dirty = False
+        if self.cache_file:
+            self._load_cache()
+
+    def _load_cache(self) -> None:
+        """加载分析结果缓存"""
+        if not self.cache_file.exists():
+            return
+
+        try:
+            with open(self.cache_file, 'rb') as f:
+                data = _loads(f.read())
+            # 格式不同的旧缓存（含完整内部文件列表）直接丢弃
+            if data.get('version') != self.CACHE_VERSION:
+                logger.info("分析缓存格式已更新，重新建立缓存")
+                return
+            self._cache = data['entries']
+            logger.info(f"加载分析缓存: {len(self._cache)} 条")
+        except Exception as e:
+            logger.warning(f"加载分析缓存失败: {e}")
+            self._cache = {}
+
+    def save_cache(self) -> None:
+        """保存分析结果缓存（临时文件 + 原子替换）"""
+        if not self.cache_file or not self._cache_dirty:
+            return
+
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            temp_file = self.cache_file.with_suffix('.tmp')
+            with open(temp_file, 'wb') as f:
+                f.write(_dumps({'version': self.CACHE_VERSION, 'entries': self._cache}))
+            temp_file.replace(self.cache_file)
+            self._cache_dirty = False
+        except Exception as e:
+            logger.warning(f"保存分析缓存失败: {e}")
+
     def scan_directory(self) -> None:
         """扫描目录中的所有RAR文件"""
         logger.info(f"开始扫描目录: {self.target_dir}")
@@ -122,11 +238,9 @@ class RARInspector:
             logger.error(f"目录不存在: {self.target_dir}")
             return
 
-        # 递归查找所有RAR文件
-        rar_files = []
-        for ext in self.RAR_EXTENSIONS:
-            pattern = f"**/*{ext}"
-            rar_files.extend(self.target_dir.glob(pattern))
+        # 递归查找所有RAR文件（单次遍历，排序保证扫描顺序稳定）
+        rar_files = sorted(self._iter_rar_files(self.target_dir))
+        found = {str(rar_path) for rar_path in rar_files}
 
         # 应用文件数量限制
         total_found = len(rar_files)
@@ -137,38 +251,104 @@ class RARInspector:
             logger.info(f"找到 {total_found} 个RAR文件")
 
         self.stats['total_rar_files'] = len(rar_files)
+        self._prune_cache(found)
+
+        # 并行分析每个RAR文件（耗时主要在读取文件头的磁盘I/O，线程即可并行）
+        # 结果按提交顺序在主线程汇总，报告顺序与文件列表一致，统计无需加锁
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(self._analyze_rar_file, rar_path) for rar_path in rar_files]
+            if tqdm:
+                # 进度条按时间间隔刷新，不在每次迭代时格式化进度信息
+                for rar_path, future in tqdm(zip(rar_files, futures), total=len(rar_files),
+                                             mininterval=0.5, unit='rar'):
+                    self._collect_result(rar_path, future)
+            else:
+                for idx, (rar_path, future) in enumerate(zip(rar_files, futures), 1):
+                    self._collect_result(rar_path, future)
+                    if idx % 10 == 0:
+                        logger.info(f"进度: {idx}/{len(rar_files)}")
+
+        self.save_cache()
+        logger.info("扫描完成")
+
+    def _prune_cache(self, found: Set[str]) -> None:
+        """
+        删除目标目录下已不存在的文件的缓存条目（其他目录的条目保留）
+
+        Args:
+            found: 本次扫描找到的文件路径集合
+        """
+        if not self.cache_file:
+            return
 
-        # 分析每个RAR文件
-        for idx, rar_path in enumerate(rar_files, 1):
-            if idx % 10 == 0:
-                logger.info(f"进度: {idx}/{len(rar_files)}")
+        root = str(self.target_dir)
+        prefix = root.rstrip(os.sep) + os.sep
+        stale = [key for key in self._cache
+                 if (key == root or key.startswith(prefix)) and key not in found]
+        for key in stale:
+            del self._cache[key]
+        if stale:
+            logger.info(f"清理失效的分析缓存: {len(stale)} 条")
+            self._cache_dirty = True
+
+    def _iter_rar_files(self, root: Path) -> Iterator[Path]:
+        """
+        单次遍历目录树，返回扩展名（不区分大小写）为RAR的文件
 
+        Args:
+            root: 根目录
+
+        Yields:
+            RAR文件路径
+        """
+        stack = [str(root)]
+        while stack:
+            current = stack.pop()
             try:
-                rar_info = self._analyze_rar_file(rar_path)
-                self.rar_files.append(rar_info)
-
-                # 更新统计
-                self.stats['total_size'] += rar_info.file_size
-                if rar_info.is_nested:
-                    self.stats['nested_rar_files'] += 1
-                if rar_info.nesting_level > self.stats['max_nesting_level']:
-                    self.stats['max_nesting_level'] = rar_info.nesting_level
-                if rar_info.has_japanese_tags:
-                    self.stats['files_with_japanese_tags'] += 1
-                if rar_info.needs_cleaning:
-                    self.stats['files_needing_cleaning'] += 1
-                if rar_info.analysis_errors:
-                    self.stats['analysis_errors'] += 1
-
-                # 更新文件类型统计
-                for file_type, count in rar_info.file_types.items():
-                    self.file_type_stats[file_type] += count
-
-            except Exception as e:
-                logger.error(f"分析文件失败 {rar_path}: {e}")
+                it = os.scandir(current)
+            except OSError as e:
+                # 无权限读取的目录（如System Volume Information）跳过，不中断整个扫描
+                logger.warning(f"无法读取目录，已跳过: {current} ({e})")
+                continue
+            with it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file() and os.path.splitext(entry.name)[1].lower() in self.RAR_EXTENSIONS:
+                        yield Path(entry.path)
+
+    def _collect_result(self, rar_path: Path, future: Future) -> None:
+        """
+        汇总单个RAR文件的分析结果
+
+        Args:
+            rar_path: RAR文件路径
+            future: 分析任务
+        """
+        try:
+            rar_info = future.result()
+            self.rar_files.append(rar_info)
+
+            # 更新统计
+            self.stats['total_size'] += rar_info.file_size
+            if rar_info.is_nested:
+                self.stats['nested_rar_files'] += 1
+            if rar_info.nesting_level > self.stats['max_nesting_level']:
+                self.stats['max_nesting_level'] = rar_info.nesting_level
+            if rar_info.has_japanese_tags:
+                self.stats['files_with_japanese_tags'] += 1
+            if rar_info.needs_cleaning:
+                self.stats['files_needing_cleaning'] += 1
+            if rar_info.analysis_errors:
                 self.stats['analysis_errors'] += 1
 
-        logger.info("扫描完成")
+            # 更新文件类型统计
+            for file_type, count in rar_info.file_types.items():
+                self.file_type_stats[file_type] += count
+
+        except Exception as e:
+            logger.error(f"分析文件失败 {rar_path}: {e}")
+            self.stats['analysis_errors'] += 1
 
     def _analyze_rar_file(self, rar_path: Path, current_depth: int = 0) -> RARFileInfo:
         """
@@ -181,36 +361,58 @@ class RARInspector:
         Returns:
             RARFileInfo对象
         """
-        file_size = rar_path.stat().st_size
+        st = rar_path.stat()
+        file_size = st.st_size
+
+        # 文件大小和修改时间未变时直接复用上次的分析结果
+        # （缓存不含内部文件列表，需要列表时重新读取文件头）
+        cache_key = str(rar_path)
+        cached = self._cache.get(cache_key) if self.cache_file else None
+        if (cached and not self.collect_inner_files
+                and cached['mtime'] == st.st_mtime_ns and cached['size'] == file_size):
+            return RARFileInfo(inner_files=[], **cached['info'])
+
         inner_files = []
+        total_inner_files = 0
         inner_rar_count = 0
-        file_types = defaultdict(int)
+        file_types: Dict[str, int] = {}
         errors = []
 
+        # 循环内用到的属性和方法先取到局部变量
+        rar_exts = self.RAR_EXTENSIONS
+        collect = self.collect_inner_files
+        append_inner = inner_files.append
+
         try:
+            # rarfile在Python中解析文件头得到成员列表（不调用UnRAR），只需遍历一次
             with rarfile.RarFile(str(rar_path)) as rf:
-                for member in rf.infolist():
-                    if member.is_dir():
-                        continue
-
-                    # 获取文件信息
-                    file_info = {
-                        'name': member.filename,
+                members = rf.infolist()
+
+            for member in members:
+                # rarfile统一使用'/'分隔路径，目录名以'/'结尾
+                fn = member.filename
+                if fn.endswith('/'):
+                    continue
+                total_inner_files += 1
+
+                # 检查文件类型（只看最后一级文件名，与Path.suffix一致，但不创建Path对象）
+                base = fn[fn.rfind('/') + 1:]
+                dot = base.rfind('.')
+                file_ext = _intern(base[dot:].lower()) if dot > 0 else ''
+                file_types[file_ext] = file_types.get(file_ext, 0) + 1
+
+                # 检查是否是嵌套的RAR
+                is_rar = file_ext in rar_exts
+                if is_rar:
+                    inner_rar_count += 1
+
+                if collect:
+                    append_inner({
+                        'name': fn,
                         'size': member.file_size,
                         'compress_size': member.compress_size,
-                        'is_rar': False
-                    }
-
-                    # 检查文件类型
-                    file_ext = Path(member.filename).suffix.lower()
-                    file_types[file_ext] += 1
-
-                    # 检查是否是嵌套的RAR
-                    if file_ext in self.RAR_EXTENSIONS:
-                        inner_rar_count += 1
-                        file_info['is_rar'] = True
-
-                    inner_files.append(file_info)
+                        'is_rar': is_rar
+                    })
 
         except Exception as e:
             error_msg = f"无法读取RAR文件: {e}"
@@ -219,14 +421,8 @@ class RARInspector:
 
         # 分析文件名
         file_name = rar_path.name
-        has_japanese_tags = False
-        japanese_tags = []
-
-        for pattern in self.JAPANESE_TAG_PATTERNS:
-            matches = re.findall(pattern, file_name)
-            if matches:
-                has_japanese_tags = True
-                japanese_tags.extend(matches)
+        japanese_tags = [_intern(tag) for tag in self._JP_TAG_RE.findall(file_name)]
+        has_japanese_tags = bool(japanese_tags)
 
         # 提取系列名和卷号
         series_name, volume_info = self._extract_series_and_volume(file_name)
@@ -237,15 +433,15 @@ class RARInspector:
         # 计算嵌套层级
         nesting_level = 1 if inner_rar_count > 0 else 0
 
-        return RARFileInfo(
+        rar_info = RARFileInfo(
             file_path=str(rar_path),
             file_size=file_size,
             is_nested=inner_rar_count > 0,
             nesting_level=nesting_level,
             inner_rar_count=inner_rar_count,
             inner_files=inner_files,
-            total_inner_files=len(inner_files),
-            file_types=dict(file_types),
+            total_inner_files=total_inner_files,
+            file_types=file_types,
             has_japanese_tags=has_japanese_tags,
             japanese_tags=japanese_tags,
             series_name=series_name,
@@ -254,9 +450,25 @@ class RARInspector:
             analysis_errors=errors if errors else None
         )
 
-    def _extract_series_and_volume(self, filename: str) -> Tuple[Optional[str], Optional[str]]:
+        # 读取失败可能是暂时性的，不缓存
+        if self.cache_file and not errors:
+            # 各线程写入不同的键，dict单次赋值在GIL下是原子的
+            info = _rar_info_dict(rar_info)
+            del info['inner_files']
+            self._cache[cache_key] = {
+                'mtime': st.st_mtime_ns,
+                'size': file_size,
+                'info': info
+            }
+            self._cache_dirty = True
+
+        return rar_info
+
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def _extract_series_and_volume(filename: str) -> Tuple[Optional[str], Optional[str]]:
         """
-        从文件名提取系列名和卷号
+        从文件名提取系列名和卷号（结果只取决于文件名，按文件名缓存）
 
         Args:
             filename: 文件名
@@ -268,23 +480,22 @@ class RARInspector:
         name = Path(filename).stem
 
         # 移除日文标记
-        for pattern in self.JAPANESE_TAG_PATTERNS:
-            name = re.sub(pattern, '', name)
+        name = RARInspector._JP_TAG_RE.sub('', name)
 
         # 尝试提取卷号
         volume = None
-        for pattern in self.VOLUME_PATTERNS:
-            match = re.search(pattern, name)
+        for pattern in RARInspector._VOL_RES:
+            match = pattern.search(name)
             if match:
                 volume = match.group(1)
                 # 移除卷号部分，剩下的是系列名
-                name = re.sub(pattern, '', name)
+                name = pattern.sub('', name)
                 break
 
         # 清理系列名
         series_name = name.strip(' -_「」『』[]【】')
 
-        return series_name if series_name else None, volume
+        return _intern(series_name) if series_name else None, volume
 
     def generate_report(self, output_file: Optional[str] = None, mode: str = 'detailed') -> Dict:
         """
@@ -295,7 +506,7 @@ class RARInspector:
             mode: 报告模式 ('simple' 或 'detailed')
 
         Returns:
-            报告字典
+            报告字典（详细模式写入文件时逐条流式写出文件信息，返回值不含files）
         """
         report = {
             'timestamp': datetime.now().isoformat(),
@@ -305,8 +516,13 @@ class RARInspector:
         }
 
         if mode == 'detailed':
+            if output_file:
+                # 详细模式写文件：逐个序列化文件信息，不在内存中构建完整列表
+                self._write_detailed_report(Path(output_file), report)
+                return report
+
             # 详细模式：包含所有文件信息
-            report['files'] = [asdict(rar_info) for rar_info in self.rar_files]
+            report['files'] = [_rar_info_dict(rar_info) for rar_info in self.rar_files]
         else:
             # 简单模式：只包含需要处理的文件
             nested_files = [
@@ -332,6 +548,30 @@ class RARInspector:
 
         return report
 
+    def _write_detailed_report(self, output_path: Path, header: Dict) -> None:
+        """
+        流式写出详细报告
+
+        Args:
+            output_path: 输出文件路径
+            header: 报告头部字段（不含files）
+        """
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(output_path, 'wb', buffering=1 << 20) as f:
+            f.write(b'{')
+            for key, value in header.items():
+                f.write(_dumps(key) + b':' + _dumps(value) + b',\n')
+
+            f.write(b'"files":[')
+            for idx, rar_info in enumerate(self.rar_files):
+                if idx:
+                    f.write(b',')
+                f.write(b'\n')
+                f.write(_dumps(_rar_info_dict(rar_info)))
+            f.write(b'\n]}\n')
+
+        logger.info(f"报告已保存到: {output_path}")
+
     def print_summary(self) -> None:
         """打印摘要报告"""
         print("\n" + "=" * 80)
@@ -391,11 +631,17 @@ def main():
     parser.add_argument('--output', '-o', help='输出JSON报告文件路径')
     parser.add_argument('--max-depth', type=int, default=10, help='最大嵌套深度（默认10）')
     parser.add_argument('--max-files', '-n', type=int, help='最大扫描文件数（用于测试）')
+    parser.add_argument('--workers', '-w', type=int, help='并行分析的线程数（默认CPU核心数的2倍）')
+    parser.add_argument('--no-cache', action='store_true', help='不使用分析结果缓存，重新分析所有文件')
 
     args = parser.parse_args()
 
     # 创建探测器
-    inspector = RARInspector(args.dir, max_depth=args.max_depth, max_files=args.max_files)
+    # 只有详细报告会输出内部文件列表
+    inspector = RARInspector(args.dir, max_depth=args.max_depth, max_files=args.max_files,
+                             workers=args.workers,
+                             collect_inner_files=bool(args.output) and args.mode == 'detailed',
+                             cache_file=None if args.no_cache else ".progress/rar_inspector_cache.json")
 
     # 扫描目录
     inspector.scan_directory()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+自适应速率限制器
+根据API响应（状态码、Retry-After、X-RateLimit-*响应头）动态调整请求间隔：
+成功时加性缩短间隔，429/5xx时乘性延长间隔（AIMD）
+"""
+
+import threading
+import time
+import logging
+from email.utils import parsedate_to_datetime
+from typing import Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """自适应速率限制器（线程安全）"""
+
+    def __init__(self, interval: float = 1.0, max_interval: float = 60.0,
+                 decrease_step: float = 0.05, backoff_factor: float = 2.0):
+        """
+        初始化速率限制器
+
+        Args:
+            interval: 初始请求间隔（秒），在服务器未告知配额时也是最小间隔
+            max_interval: 最大请求间隔（秒）
+            decrease_step: 每次成功后缩短的间隔（秒）
+            backoff_factor: 被限流或服务器错误时间隔的放大倍数
+        """
+        self.interval = interval
+        self.min_interval = interval
+        self.max_interval = max_interval
+        self.decrease_step = decrease_step
+        self.backoff_factor = backoff_factor
+
+        self._lock = threading.Lock()
+        self._last_request = 0.0
+        self._blocked_until = 0.0
+
+    def wait(self):
+        """等待直到允许发送下一个请求"""
+        with self._lock:
+            now = time.monotonic()
+            next_allowed = max(self._last_request + self.interval, self._blocked_until)
+            if next_allowed > now:
+                time.sleep(next_allowed - now)
+            self._last_request = time.monotonic()
+
+    def on_response(self, status_code: int, headers: Mapping[str, str]):
+        """
+        根据响应调整请求间隔
+
+        Args:
+            status_code: HTTP状态码
+            headers: 响应头
+        """
+        with self._lock:
+            # 服务器告知每分钟配额时，允许的最小间隔以配额为准
+            limit = self._parse_number(headers.get('X-RateLimit-Limit'))
+            if limit:
+                self.min_interval = 60.0 / limit
+
+            retry_after = self._parse_retry_after(headers.get('Retry-After'))
+            remaining = self._parse_number(headers.get('X-RateLimit-Remaining'))
+            reset = self._parse_number(headers.get('X-RateLimit-Reset'))
+
+            if retry_after is not None:
+                self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+            elif remaining == 0 and reset:
+                # X-RateLimit-Reset为Unix时间戳
+                self._blocked_until = max(self._blocked_until,
+                                          time.monotonic() + max(0.0, reset - time.time()))
+
+            if status_code == 429 or status_code >= 500:
+                self.interval = min(self.max_interval, self.interval * self.backoff_factor)
+                logger.warning(f"请求被限流或服务器错误 (HTTP {status_code})，请求间隔调整为 {self.interval:.2f}秒")
+            else:
+                self.interval = max(self.min_interval, self.interval - self.decrease_step)
+
+    @staticmethod
+    def _parse_number(value: Optional[str]) -> Optional[float]:
+        """解析数字响应头"""
+        if value is None:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+        """解析Retry-After响应头（秒数或HTTP日期）"""
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
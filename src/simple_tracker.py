@@ -3,12 +3,14 @@
 """
 简化的进度跟踪器
 只记录已完成文件列表，不需要复杂状态
+新完成的文件逐行追加到日志文件，JSON快照只在snapshot()时重写
 """
 
 import json
 import os
+import sys
 from pathlib import Path
-from typing import Set, Optional
+from typing import List, Set, Optional
 from datetime import datetime
 
 
@@ -23,9 +25,12 @@ class SimpleTracker:
             tracking_file: 跟踪文件路径
         """
         self.tracking_file = Path(tracking_file)
+        self.log_file = self.tracking_file.with_suffix('.log')
         self.completed: Set[str] = set()
         self.started_at: Optional[str] = None
         self.last_updated: Optional[str] = None
+        # 日志文件中尚未合并到快照的行数
+        self._log_count = 0
 
         # 确保目录存在
         self.tracking_file.parent.mkdir(parents=True, exist_ok=True)
@@ -33,6 +38,9 @@ class SimpleTracker:
         # 加载已完成列表
         self._load()
 
+        # 行缓冲：每个文件名写完即落盘
+        self._log_fp = open(self.log_file, 'a', encoding='utf-8', buffering=1)
+
     def _load(self):
         """加载已完成列表"""
         if self.tracking_file.exists():
@@ -46,22 +54,96 @@ class SimpleTracker:
                 print(f"Warning: Failed to load tracking file: {e}")
                 self.completed = set()
 
-    def _save(self):
-        """保存已完成列表"""
+        # 合并快照之后追加的文件名
+        if self.log_file.exists():
+            try:
+                with open(self.log_file, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        file_name = line.rstrip('\n')
+                        if file_name:
+                            self.completed.add(file_name)
+                            self._log_count += 1
+            except Exception as e:
+                print(f"Warning: Failed to load tracking log: {e}")
+
+    def _append(self, file_names: List[str]):
+        """
+        追加文件名到日志文件
+
+        Args:
+            file_names: 文件名列表
+        """
+        self._log_fp.write(''.join(f"{file_name}\n" for file_name in file_names))
+        self._log_count += len(file_names)
+
+        now = datetime.now().isoformat()
+        self.last_updated = now
+        if not self.started_at:
+            self.started_at = now
+
+    def snapshot(self):
+        """将已完成列表写入JSON快照并清空日志文件（日志为空时快照已是最新，不重写）"""
+        if not self._log_count:
+            return
+
         data = {
             'started_at': self.started_at or datetime.now().isoformat(),
             'last_updated': datetime.now().isoformat(),
             'total_completed': len(self.completed),
-            'completed': sorted(list(self.completed))
+            # 快照只用于重建集合，不需要排序；需要人工查看时用export_readable
+            'completed': list(self.completed)
         }
 
-        with open(self.tracking_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        # 先完整序列化再一次写入，避免json.dump产生大量小块写入
+        payload = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        temp_file = self.tracking_file.with_suffix('.tmp')
+        with open(temp_file, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        temp_file.replace(self.tracking_file)
+        self._fsync_dir()
+
+        # 快照已包含全部文件名且已落盘，此时才能清空日志
+        self._log_fp.truncate(0)
+        self._log_count = 0
 
         self.last_updated = data['last_updated']
         if not self.started_at:
             self.started_at = data['started_at']
 
+    def _fsync_dir(self):
+        """同步跟踪文件所在目录，使重命名持久化（Windows不支持打开目录，跳过）"""
+        if sys.platform == 'win32':
+            return
+        fd = os.open(str(self.tracking_file.parent), os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def export_readable(self, output_file: str):
+        """
+        导出排序后的已完成列表（便于人工查看和比较）
+
+        Args:
+            output_file: 输出文件路径
+        """
+        data = {
+            'started_at': self.started_at,
+            'last_updated': self.last_updated,
+            'total_completed': len(self.completed),
+            'completed': sorted(self.completed)
+        }
+
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+    def close(self):
+        """合并日志到快照并关闭日志文件"""
+        self.snapshot()
+        self._log_fp.close()
+
     def is_completed(self, file_path: str) -> bool:
         """
         检查文件是否已完成
@@ -84,8 +166,26 @@ class SimpleTracker:
             file_path: 文件路径
         """
         file_name = Path(file_path).name
-        self.completed.add(file_name)
-        self._save()
+        if file_name not in self.completed:
+            self.completed.add(file_name)
+            self._append([file_name])
+
+    def mark_completed_many(self, file_paths: List[str]):
+        """
+        批量标记文件为已完成（一次写入日志）
+
+        Args:
+            file_paths: 文件路径列表
+        """
+        new_names = []
+        for file_path in file_paths:
+            file_name = Path(file_path).name
+            if file_name not in self.completed:
+                self.completed.add(file_name)
+                new_names.append(file_name)
+
+        if new_names:
+            self._append(new_names)
 
     def get_stats(self) -> dict:
         """
@@ -107,3 +207,5 @@ class SimpleTracker:
         self.last_updated = None
         if self.tracking_file.exists():
             self.tracking_file.unlink()
+        self._log_fp.truncate(0)
+        self._log_count = 0
@@ -6,173 +6,327 @@
 
 import sys
 import os
-
-# 设置输出编码为UTF-8
+import io
+import time
+import shutil
+import argparse
+import functools
+import importlib
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Tuple
+
+if TYPE_CHECKING:
+    # typing.Final需要Python 3.8，本脚本需在3.7上也能运行以报告版本问题
+    from typing import Final
+
+# 设置输出编码为UTF-8（原地修改，保留原有的行缓冲设置）
 if sys.platform == 'win32':
-    import io
-    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
-    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+    for stream in (sys.stdout, sys.stderr):
+        if hasattr(stream, 'reconfigure'):
+            stream.reconfigure(encoding='utf-8')
 
-def check_python_version():
-    """检查Python版本"""
-    version = sys.version_info
-    print(f"Python版本: {version.major}.{version.minor}.{version.micro}")
-    if version.major >= 3 and version.minor >= 7:
-        print("✓ Python版本符合要求 (>=3.7)")
-        return True
-    else:
-        print("✗ Python版本过低，需要3.7或更高版本")
-        return False
+# Python版本要求在导入时计算一次
+PY_OK = sys.version_info >= (3, 7)
+PY_VER_STR = '.'.join(map(str, sys.version_info[:3]))
 
-def check_modules():
-    """检查必需的Python模块"""
-    required_modules = {
-        'zipfile': '处理ZIP/CBZ文件',
-        'rarfile': '处理RAR/CBR文件',
-        'pathlib': '路径处理',
-        'json': 'JSON处理',
-        'logging': '日志记录',
-        'shutil': '文件操作',
-        're': '正则表达式',
-        'dataclasses': '数据类',
-    }
-
-    all_ok = True
-    print("\n检查Python模块:")
-    for module, desc in required_modules.items():
-        try:
-            __import__(module)
-            print(f"✓ {module:20s} - {desc}")
-        except ImportError:
-            print(f"✗ {module:20s} - {desc} [缺失]")
-            all_ok = False
-
-    return all_ok
-
-def check_unrar():
-    """检查UnRAR工具"""
-    print("\n检查UnRAR工具:")
+# 1 GiB字节数；建议的最小可用空间（GiB）
+GIB = 1 << 30
+MIN_FREE_GIB = 10
 
-    try:
-        import rarfile
-        from pathlib import Path
+# 文件系统探测结果的缓存有效期（秒）：重复调用检查时不重复stat，过期后重新探测
+PROBE_TTL = 5.0
+_probe_cache: Dict[Tuple[str, str], Tuple[float, Any]] = {}
 
-        # 配置UnRAR工具路径（与主脚本保持一致）
-        rarfile.UNRAR_TOOL = r"C:\Program Files\UnRAR\UnRAR.exe"
 
-        unrar_path = Path(rarfile.UNRAR_TOOL)
-        print(f"配置的UnRAR路径: {unrar_path}")
+def _cached_probe(kind: str, path: str, probe: Callable[[str], Any]) -> Any:
+    """
+    带有效期的文件系统探测缓存
 
-        # 检查文件是否存在
-        if unrar_path.exists():
-            print(f"✓ 找到UnRAR: {unrar_path}")
-            return True
-        else:
-            print("✗ UnRAR工具不存在于配置的路径")
-            print(f"  当前配置路径: {unrar_path}")
-            print("\n请确认UnRAR.exe已放置在该位置")
-            print("  下载: https://www.rarlab.com/rar_add.htm")
-            return False
+    Args:
+        kind: 探测类型
+        path: 路径
+        probe: 探测函数
 
-    except Exception as e:
-        print(f"✗ 检查UnRAR时出错: {e}")
-        return False
+    Returns:
+        探测结果
+    """
+    key = (kind, path)
+    now = time.monotonic()
+    cached = _probe_cache.get(key)
+    if cached and now - cached[0] < PROBE_TTL:
+        return cached[1]
 
-def check_disk_space():
-    """检查磁盘空间"""
-    print("\n检查磁盘空间:")
+    value = probe(path)
+    _probe_cache[key] = (now, value)
+    return value
+
+
+def _stat_tool(path: str) -> Tuple[bool, bool]:
+    """
+    用一次stat同时判断工具是否存在及是否可执行
+
+    Args:
+        path: 工具路径
+
+    Returns:
+        (是否存在, 是否可执行)
+    """
     try:
-        import shutil
-        total, used, free = shutil.disk_usage(".")
+        st = os.stat(path)
+    except OSError:
+        return False, False
+    executable = bool(st.st_mode & 0o111) or path.lower().endswith('.exe')
+    return True, executable
 
-        print(f"总空间: {total // (2**30)} GB")
-        print(f"已使用: {used // (2**30)} GB")
-        print(f"可用: {free // (2**30)} GB")
 
-        if free > 10 * (2**30):  # 10GB
-            print("✓ 磁盘空间充足")
-            return True
-        else:
-            print("⚠ 磁盘空间可能不足，建议至少有10GB可用空间")
-            return False
-    except Exception as e:
-        print(f"✗ 检查磁盘空间时出错: {e}")
-        return False
+def _cached_tool_status(path: str) -> Tuple[bool, bool]:
+    """工具是否存在及是否可执行（缓存）"""
+    return _cached_probe('tool', path, _stat_tool)
 
-def test_basic_operations():
-    """测试基本操作"""
-    print("\n测试基本操作:")
 
+# UnRAR安装目录及主脚本中配置的UnRAR路径
+UNRAR_DIR = r"C:\Program Files\UnRAR"
+UNRAR_DEFAULT = r"C:\Program Files\UnRAR\UnRAR.exe"
+# 安装目录下可能的可执行文件名（按优先级）
+UNRAR_CANDIDATES = ('UnRAR.exe', 'unrar.exe', 'UnRAR64.exe')
+
+
+def _find_unrar(directory: str) -> Optional[str]:
+    """
+    读取一次目录，在其中查找UnRAR可执行文件（代替逐个候选路径stat）
+
+    Args:
+        directory: UnRAR安装目录
+
+    Returns:
+        找到的UnRAR路径，未找到时为None
+    """
     try:
-        from pathlib import Path
-        import tempfile
-        import zipfile
+        with os.scandir(directory) as it:
+            names = {entry.name for entry in it}
+    except OSError:
+        return None
+
+    for name in UNRAR_CANDIDATES:
+        if name in names:
+            return os.path.join(directory, name)
+    return None
 
-        # 创建临时测试文件
-        with tempfile.TemporaryDirectory() as tmpdir:
-            test_dir = Path(tmpdir)
 
-            # 测试1: 创建目录
-            test_subdir = test_dir / "test_dir"
-            test_subdir.mkdir()
-            print("✓ 创建目录")
+def _cached_disk_usage(path: str):
+    """磁盘使用情况（缓存）"""
+    return _cached_probe('disk_usage', path, shutil.disk_usage)
 
-            # 测试2: 创建文件
-            test_file = test_subdir / "test.txt"
-            test_file.write_text("测试内容", encoding='utf-8')
-            print("✓ 创建文件")
 
-            # 测试3: 创建ZIP文件
-            zip_file = test_dir / "test.zip"
-            with zipfile.ZipFile(zip_file, 'w') as zf:
-                zf.write(test_file, "test.txt")
-            print("✓ 创建ZIP文件")
+@functools.lru_cache(maxsize=None)
+def _load_rarfile():
+    """
+    首次调用时才导入rarfile，结果（包括导入失败）只计算一次
+
+    Returns:
+        rarfile模块，未安装时为None
+    """
+    try:
+        return importlib.import_module('rarfile')
+    except ImportError:
+        return None
 
-            # 测试4: 解压ZIP文件
-            extract_dir = test_dir / "extract"
-            extract_dir.mkdir()
-            with zipfile.ZipFile(zip_file, 'r') as zf:
-                zf.extractall(extract_dir)
-            print("✓ 解压ZIP文件")
 
-        return True
+# 各检查函数返回 (是否通过, 输出文本)，输出由main统一写出，每项检查只写一次
+
+def check_python_version() -> Tuple[bool, str]:
+    """检查Python版本"""
+    out = [f"Python版本: {PY_VER_STR}"]
+    if PY_OK:
+        out.append("✓ Python版本符合要求 (>=3.7)")
+    else:
+        out.append("✗ Python版本过低，需要3.7或更高版本")
+    return PY_OK, '\n'.join(out)
+
+# 必需的Python模块及用途
+REQUIRED_MODULES = (
+    ('zipfile', '处理ZIP/CBZ文件'),
+    ('rarfile', '处理RAR/CBR文件'),
+    ('pathlib', '路径处理'),
+    ('json', 'JSON处理'),
+    ('logging', '日志记录'),
+    ('shutil', '文件操作'),
+    ('re', '正则表达式'),
+    ('dataclasses', '数据类'),
+)
+
+
+def check_modules() -> Tuple[bool, str]:
+    """检查必需的Python模块"""
+    # 只查找模块而不执行模块代码（rarfile在check_unrar中才真正导入）
+    found = [importlib.util.find_spec(module) is not None for module, _ in REQUIRED_MODULES]
+    out = ["\n检查Python模块:"]
+    out += [
+        f"✓ {module:20s} - {desc}" if ok else f"✗ {module:20s} - {desc} [缺失]"
+        for (module, desc), ok in zip(REQUIRED_MODULES, found)
+    ]
+    return all(found), '\n'.join(out)
+
+def check_unrar() -> Tuple[bool, str]:
+    """检查UnRAR工具"""
+    out = ["\n检查UnRAR工具:"]
+    ok = False
+
+    try:
+        rarfile = _load_rarfile()
+        if rarfile is None:
+            out.append("✗ 未安装rarfile模块")
+            return ok, '\n'.join(out)
+
+        # 在安装目录中查找UnRAR，找不到时使用主脚本中配置的路径
+        unrar_path = _cached_probe('unrar_dir', UNRAR_DIR, _find_unrar) or UNRAR_DEFAULT
+        rarfile.UNRAR_TOOL = unrar_path
+        out.append(f"配置的UnRAR路径: {unrar_path}")
+
+        # 检查文件是否存在及是否可执行（一次stat）
+        exists, executable = _cached_tool_status(unrar_path)
+        if exists and executable:
+            out.append(f"✓ 找到UnRAR: {unrar_path}")
+            if os.path.normcase(unrar_path) != os.path.normcase(UNRAR_DEFAULT):
+                out.append(f"  注意：主脚本配置的路径为 {UNRAR_DEFAULT}，请相应修改")
+            ok = True
+        elif exists:
+            out.append(f"✗ UnRAR存在但不可执行: {unrar_path}")
+        else:
+            out.append("✗ UnRAR工具不存在于配置的路径")
+            out.append(f"  当前配置路径: {unrar_path}")
+            out.append("\n请确认UnRAR.exe已放置在该位置")
+            out.append("  下载: https://www.rarlab.com/rar_add.htm")
 
     except Exception as e:
-        print(f"✗ 基本操作测试失败: {e}")
-        return False
+        out.append(f"✗ 检查UnRAR时出错: {e}")
 
-def main():
-    """主函数"""
-    print("=" * 60)
-    print("漫画整理工具 - 环境检查")
-    print("=" * 60)
+    return ok, '\n'.join(out)
+
+def check_disk_space() -> Tuple[bool, str]:
+    """检查磁盘空间"""
+    out = ["\n检查磁盘空间:"]
+    ok = False
+    try:
+        total, used, free = _cached_disk_usage(".")
 
-    results = []
+        out.append(f"总空间: {total >> 30} GB")
+        out.append(f"已使用: {used >> 30} GB")
+        out.append(f"可用: {free >> 30} GB")
 
-    results.append(("Python版本", check_python_version()))
-    results.append(("Python模块", check_modules()))
-    results.append(("UnRAR工具", check_unrar()))
-    results.append(("磁盘空间", check_disk_space()))
-    results.append(("基本操作", test_basic_operations()))
+        if free > MIN_FREE_GIB * GIB:
+            out.append("✓ 磁盘空间充足")
+            ok = True
+        else:
+            out.append("⚠ 磁盘空间可能不足，建议至少有10GB可用空间")
+    except Exception as e:
+        out.append(f"✗ 检查磁盘空间时出错: {e}")
+
+    return ok, '\n'.join(out)
 
-    print("\n" + "=" * 60)
-    print("检查结果汇总:")
-    print("=" * 60)
+def test_basic_operations() -> Tuple[bool, str]:
+    """测试基本操作"""
+    out = ["\n测试基本操作:"]
+    ok = False
+
+    try:
+        import zipfile
 
-    for name, result in results:
-        status = "✓ 通过" if result else "✗ 失败"
-        print(f"{name:20s}: {status}")
+        # 在内存中完成ZIP往返，只验证zipfile模块本身，不涉及文件系统
+        # 同时覆盖存储和压缩（整理CBZ时使用ZIP_DEFLATED，依赖zlib）
+        content = "测试内容".encode('utf-8')
+        members = {"stored.txt": zipfile.ZIP_STORED, "deflated.txt": zipfile.ZIP_DEFLATED}
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, 'w') as zf:
+            for name, compress_type in members.items():
+                zf.writestr(name, content, compress_type=compress_type)
+        out.append("✓ 创建ZIP文件")
+
+        buf.seek(0)
+        with zipfile.ZipFile(buf) as zf:
+            mismatched = [name for name in members if zf.read(name) != content]
+        if mismatched:
+            out.append(f"✗ 解压内容与原内容不一致: {', '.join(mismatched)}")
+        else:
+            out.append("✓ 解压ZIP文件")
+            ok = True
 
-    all_passed = all(result for _, result in results)
+    except Exception as e:
+        out.append(f"✗ 基本操作测试失败: {e}")
+
+    return ok, '\n'.join(out)
+
+def _iter_results(checks, parallel: bool):
+    """
+    按原顺序逐项返回检查结果
+
+    Args:
+        checks: (名称, 检查函数)列表
+        parallel: 是否并行执行（否则顺序执行，调用方中途停止时后续检查不会运行）
+
+    Yields:
+        (名称, (是否通过, 输出文本))
+    """
+    if not parallel:
+        for name, fn in checks:
+            yield name, fn()
+        return
+
+    # 各项检查互不依赖，并行执行
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [(name, executor.submit(fn)) for name, fn in checks]
+        for name, future in futures:
+            yield name, future.result()
+
+
+# 所有检查项（名称, 检查函数），按输出顺序排列
+CHECKS: 'Final' = (
+    ("Python版本", check_python_version),
+    ("Python模块", check_modules),
+    ("UnRAR工具", check_unrar),
+    ("磁盘空间", check_disk_space),
+    ("基本操作", test_basic_operations),
+)
 
-    print("\n" + "=" * 60)
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='漫画整理工具 - 环境检查')
+    parser.add_argument('--fail-fast', action='store_true', help='遇到第一项失败的检查即停止')
+    parser.add_argument('--json', action='store_true', help='只输出JSON格式的检查结果（供CI等程序调用）')
+    args = parser.parse_args()
+
+    rule = "=" * 60
+    if not args.json:
+        print(f"{rule}\n漫画整理工具 - 环境检查\n{rule}")
+
+    # --fail-fast时顺序执行，第一项失败后不再运行后续检查；否则并行执行
+    # 未出现在results中的检查（因--fail-fast未运行）在汇总中显示为跳过
+    results: Dict[str, bool] = {}
+    for name, (result, output) in _iter_results(CHECKS, parallel=not args.fail_fast):
+        if not args.json:
+            sys.stdout.write(output + '\n')
+        results[name] = result
+        if args.fail_fast and not result:
+            break
+
+    all_passed = all(results.values())
+
+    if args.json:
+        # 跳过的检查输出为null；退出码表示是否全部通过
+        import json
+        sys.stdout.write(json.dumps({name: results.get(name) for name, _ in CHECKS},
+                                    ensure_ascii=False) + '\n')
+        sys.exit(0 if all_passed else 1)
+    statuses = {None: "- 跳过", True: "✓ 通过", False: "✗ 失败"}
+    summary = '\n'.join(f"{name:20s}: {statuses[results.get(name)]}" for name, _ in CHECKS)
     if all_passed:
-        print("✓ 所有检查通过，环境准备就绪！")
-        print("\n下一步：运行 python manga_organizer.py")
+        footer = "✓ 所有检查通过，环境准备就绪！\n\n下一步：运行 python manga_organizer.py"
     else:
-        print("✗ 部分检查未通过，请按照上述提示解决问题")
-        print("\n注意：UnRAR工具对于处理RAR/CBR文件是必需的")
-    print("=" * 60)
+        footer = "✗ 部分检查未通过，请按照上述提示解决问题\n\n注意：UnRAR工具对于处理RAR/CBR文件是必需的"
+
+    # 汇总一次性输出
+    print(f"\n{rule}\n检查结果汇总:\n{rule}\n{summary}\n\n{rule}\n{footer}\n{rule}")
 
 if __name__ == '__main__':
     main()